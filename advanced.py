@@ -4,7 +4,9 @@
 Core bot control library providing motor control, telemetry handling, and basic navigation functions.
 Can be imported by other modules or run standalone for manual control.
 """
-import socket, threading, json, time
+import socket, sys, threading, json, time
+import logging, logging.handlers, queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from pynput import keyboard
 from calibration_config import (
     load_pulses_per_degree,
@@ -18,6 +20,16 @@ from calibration_config import (
 RPI_IP = '192.168.4.1'      # <-- ESP32 Access Point IP (primary)
 RPI_CTRL_PORT = 9000
 LOCAL_TELEM_PORT = 9001
+CTRL_SNDBUF_BYTES = 1 << 20  # room for bursts of motor commands without blocking
+CTRL_IP_TOS = 0xB8           # DSCP EF (expedited forwarding) for motor commands
+CTRL_SO_PRIORITY = 6         # Linux qdisc priority (6 is the highest without CAP_NET_ADMIN)
+
+# Telemetry message types. json.loads returns fresh strings, so telem_loop
+# interns each parsed type once and then dispatches on identity
+MSG_TFLUNA = sys.intern('tfluna')
+MSG_IMU = sys.intern('imu')
+MSG_ENCODERS = sys.intern('encoders')
+MSG_ALIVE = sys.intern('alive')
 
 # Fallback IPs to try if primary fails
 FALLBACK_IPS = [
@@ -54,7 +66,9 @@ latest_mag = {"x":0, "y":0, "z":0}
 latest_temp_c = 0.0
 last_imu_time = 0
 latest_encoders = {"m1": 0, "m2": 0, "m3": 0, "m4": 0}
+latest_encoder_pair = (0, 0)  # (m1, m2) published as one tuple for hot polling loops
 last_enc_time = 0
+encoder_event = threading.Event()  # set on every encoder packet; waiters clear() it first
 
 # Gyro integration variables
 initial_heading_set = False
@@ -69,9 +83,16 @@ gyro_bias_z = 0.0
 calibration_loaded = False
 
 ctrl_sock = None
+ctrl_peer = None  # (host, resolved address) commands currently go to
 telem_sock = None
 telem_thread = None
+ack_thread = None
+pending_moves = {}  # seq -> Future, resolved when the ESP32 acks the finished move
+pending_moves_lock = threading.Lock()
+PENDING_MOVES_MAX = 64  # oldest unacked moves are dropped (cancelled) beyond this
 telemetry_running = False
+telem_stop = threading.Event()  # set by cleanup() to end telem_loop
+ack_stop = threading.Event()  # set by cleanup() to end ack_loop
 verbose = False
 
 gear_idx = 0
@@ -84,6 +105,16 @@ def initialize_sockets():
     global ctrl_sock, telem_sock
     if ctrl_sock is None:
         ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        ctrl_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, CTRL_SNDBUF_BYTES)
+        # Mark commands low-latency so congested queues (busy WiFi) send them first;
+        # best effort, some platforms ignore or refuse these options
+        try:
+            ctrl_sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, CTRL_IP_TOS)
+            if hasattr(socket, 'SO_PRIORITY'):
+                ctrl_sock.setsockopt(socket.SOL_SOCKET, socket.SO_PRIORITY, CTRL_SO_PRIORITY)
+        except OSError as e:
+            print(f"Could not set control socket priority: {e}")
+        ctrl_sock.bind(('', 0))  # fixed local port so command acks can be read back
         print(f"Created control socket")
     if telem_sock is None:
         telem_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -94,6 +125,23 @@ def initialize_sockets():
             print(f"Failed to bind telemetry socket: {e}")
             raise
 
+def send_ctrl(payload, host=None):
+    """Send a command datagram to the ESP32 (RPI_IP unless host is given).
+
+    The target is resolved once and reused until it changes, so hostnames such
+    as fruitbot.local aren't looked up on every send. ctrl_sock itself stays
+    unconnected: a connected UDP socket drops datagrams from any other peer,
+    so acks from a device that replies from a different address than RPI_IP
+    (e.g. after RPI_IP auto-updates to an advertised IP) would never arrive.
+    """
+    global ctrl_peer
+    if host is None:
+        host = RPI_IP
+    if ctrl_peer is None or ctrl_peer[0] != host:
+        addr = socket.getaddrinfo(host, RPI_CTRL_PORT, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        ctrl_peer = (host, addr)
+    ctrl_sock.sendto(payload, ctrl_peer[1])
+
 def clamp(x, lo, hi):
     return max(lo, min(hi, x))
 
@@ -117,6 +165,9 @@ def _scale_right(speed: float) -> int:
 # ----------------------
 # Core Motor Control
 # ----------------------
+# Fixed-shape motor command; %-formatting bytes is several times cheaper than json.dumps
+_MOTOR_TMPL = b'{"type":"motor","left":%d,"right":%d,"seq":%d,"ts":%d}'
+
 def send_motor(left, right):
     global seq, RPI_IP
     if ctrl_sock is None:
@@ -128,8 +179,7 @@ def send_motor(left, right):
     if verbose:
         print(f"[send_motor] Input: L={left}, R={right} → Scaled: L={left_cmd}, R={right_cmd}")
 
-    msg = {'type':'motor','left':left_cmd,'right':right_cmd,
-           'seq':seq, 'ts': int(time.time()*1000)}
+    payload = _MOTOR_TMPL % (left_cmd, right_cmd, seq, int(time.time()*1000))
     seq += 1
     
     # Try sending to current RPI_IP first, then fallbacks
@@ -137,7 +187,7 @@ def send_motor(left, right):
     
     for ip in ips_to_try:
         try:
-            ctrl_sock.sendto(json.dumps(msg).encode(), (ip, RPI_CTRL_PORT))
+            send_ctrl(payload, ip)
             if verbose:
                 print(f"Sent motor command to {ip}")
             break  # Success, don't try other IPs
@@ -196,10 +246,15 @@ def send_motor4(m1, m2=None, m3=None, m4=None):
         }
     msg = {'type': 'motor4', **speeds, 'seq': seq, 'ts': int(time.time()*1000)}
     seq += 1
-    ctrl_sock.sendto(json.dumps(msg).encode(), (RPI_IP, RPI_CTRL_PORT))
+    send_ctrl(json.dumps(msg).encode())
 
 def move_by_ticks(left_ticks, right_ticks, left_speed, right_speed):
-    """Move by relative encoder ticks at the requested signed speeds."""
+    """Move by relative encoder ticks at the requested signed speeds.
+
+    Returns a Future that resolves (to the ack message) when the ESP32 reports
+    the move finished; callers may ignore it or wait with .result(timeout),
+    and should cancel() it if they give up waiting.
+    """
     global seq
     if ctrl_sock is None:
         initialize_sockets()
@@ -225,8 +280,39 @@ def move_by_ticks(left_ticks, right_ticks, left_speed, right_speed):
         'seq': seq,
         'ts': int(time.time()*1000)
     }
+    # Registered before sending so a fast ack can't arrive first. The entry
+    # goes away when the Future completes, including when a caller that
+    # timed out cancel()s it
+    done = Future()
+    move_seq = seq
+    stale = []
+    with pending_moves_lock:
+        pending_moves[move_seq] = done
+        while len(pending_moves) > PENDING_MOVES_MAX:
+            stale.append(pending_moves.pop(next(iter(pending_moves))))  # ack lost
+    for old in stale:
+        old.cancel()  # outside the lock: its callback takes the lock too
+    done.add_done_callback(lambda _: _forget_move(move_seq))
     seq += 1
-    ctrl_sock.sendto(json.dumps(msg).encode(), (RPI_IP, RPI_CTRL_PORT))
+    try:
+        send_ctrl(json.dumps(msg).encode())
+    except OSError:
+        done.cancel()
+        raise
+    return done
+
+def _forget_move(move_seq):
+    with pending_moves_lock:
+        pending_moves.pop(move_seq, None)
+
+def wait_for_move(done, timeout):
+    """Wait for a move_by_ticks() Future; False (and the Future cancelled) on timeout."""
+    try:
+        done.result(timeout=timeout)
+        return True
+    except FutureTimeoutError:
+        done.cancel()  # ack lost; drop it from pending_moves
+        return False
 
 def set_servo_angle(angle_deg):
     """Set SG90 servo angle in degrees (0-180 typical)."""
@@ -235,7 +321,7 @@ def set_servo_angle(angle_deg):
         initialize_sockets()
     msg = {'type': 'servo', 'angle': float(angle_deg), 'seq': seq, 'ts': int(time.time()*1000)}
     seq += 1
-    ctrl_sock.sendto(json.dumps(msg).encode(), (RPI_IP, RPI_CTRL_PORT))
+    send_ctrl(json.dumps(msg).encode())
 
 def stepper_steps(steps, step_delay_ms=None):
     """Move 28BYJ-48 stepper by step count. Optional per-step delay in ms."""
@@ -246,7 +332,7 @@ def stepper_steps(steps, step_delay_ms=None):
     if step_delay_ms is not None:
         msg['delay_ms'] = int(step_delay_ms)
     seq += 1
-    ctrl_sock.sendto(json.dumps(msg).encode(), (RPI_IP, RPI_CTRL_PORT))
+    send_ctrl(json.dumps(msg).encode())
 
 # ----------------------
 # Telemetry Functions
@@ -263,6 +349,10 @@ def get_latest_encoders():
     """Return latest encoder counts dict and timestamp."""
     return latest_encoders, last_enc_time
 
+def get_latest_encoder_pair():
+    """Return latest (m1, m2) drive encoder counts as a tuple."""
+    return latest_encoder_pair
+
 def is_encoder_data_available():
     """Check if recent encoder data is available"""
     current_time = time.time()
@@ -362,33 +452,77 @@ def integrate_gyro_rotation(gyro_z_dps, current_time):
     
     return total_rotation_degrees
 
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves %-formatting to the listener thread.
+
+    Safe here because telem_loop only logs immutable snapshots (numbers, strings).
+    """
+    def prepare(self, record):
+        return record
+
+# telem_loop logs through a queue; a listener thread formats the lines and
+# writes them to the console, so a slow terminal can't stall packet receipt
+telem_log = logging.getLogger('esp32.telemetry')
+telem_log.setLevel(logging.INFO)
+telem_log.propagate = False
+_telem_log_queue = queue.SimpleQueue()
+_telem_log_handler = _DeferredQueueHandler(_telem_log_queue)  # attached while the listener runs
+_telem_log_listener = None
+
+def start_telemetry_logging():
+    """Start the thread that writes queued telemetry lines to stdout."""
+    global _telem_log_listener
+    if _telem_log_listener is None:
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter('%(message)s'))
+        _telem_log_listener = logging.handlers.QueueListener(_telem_log_queue, console)
+        _telem_log_listener.start()
+        telem_log.addHandler(_telem_log_handler)
+
+def stop_telemetry_logging():
+    """Flush queued telemetry lines and stop the listener thread."""
+    global _telem_log_listener
+    if _telem_log_listener is not None:
+        # Detach first so nothing is queued once no thread drains the queue
+        telem_log.removeHandler(_telem_log_handler)
+        _telem_log_listener.stop()
+        _telem_log_listener = None
+
 def telem_loop(verbose=True):
     global current_distance, last_lidar_time
     global latest_accel, latest_gyro, latest_heading, latest_mag, latest_temp_c, last_imu_time, last_enc_time
+    global latest_encoder_pair
 
     if telem_sock is None:
         initialize_sockets()
 
+    sock = telem_sock
+    start_telemetry_logging()
     print(f"Telemetry loop started, waiting for messages on port {LOCAL_TELEM_PORT}...")
     
-    while True:
+    while not telem_stop.is_set():
         try:
             # Add timeout so we can see if we're waiting for packets
-            telem_sock.settimeout(5.0)  # 5 second timeout
-            data, addr = telem_sock.recvfrom(2048)
+            sock.settimeout(5.0)  # 5 second timeout
+            data, addr = sock.recvfrom(2048)
+            if telem_stop.is_set():
+                break  # woken by cleanup()
             if verbose:
-                print(f"Received packet from {addr}: {len(data)} bytes")
+                telem_log.info("Received packet from %s: %d bytes", addr, len(data))
             j = json.loads(data.decode())
+            msg_type = j.get('type')
+            if isinstance(msg_type, str):
+                msg_type = sys.intern(msg_type)
 
             # --- LIDAR ---
-            if j.get('type') == 'tfluna':
+            if msg_type is MSG_TFLUNA:
                 current_distance = j.get('dist_mm', 0)
                 last_lidar_time = time.time()
                 if verbose:
-                    print("LIDAR:", current_distance, "mm  ts:", j['ts'])
+                    telem_log.info("LIDAR: %s mm  ts: %s", current_distance, j['ts'])
 
             # --- IMU ---
-            elif j.get('type') == 'imu':
+            elif msg_type is MSG_IMU:
                 latest_accel = j.get('accel', {"x":0,"y":0,"z":0})
                 latest_gyro  = j.get('gyro', {"x":0,"y":0,"z":0})
                 latest_heading = j.get('heading', 0.0)
@@ -405,12 +539,15 @@ def telem_loop(verbose=True):
                 
                 if verbose:
                     cal_indicator = " [CAL]" if calibration_loaded else " [RAW]"
-                    print(f"IMU accel: x={latest_accel['x']:.2f}, y={latest_accel['y']:.2f}, z={latest_accel['z']:.2f}  "
-                          f"gyro: x={corrected_gyro['x']:.2f}, y={corrected_gyro['y']:.2f}, z={corrected_gyro['z']:.2f}{cal_indicator}  "
-                          f"heading: {latest_heading:.1f}°  rotation: {current_rotation:.1f}°  ts={j.get('ts',0)}")
+                    telem_log.info("IMU accel: x=%.2f, y=%.2f, z=%.2f  "
+                                   "gyro: x=%.2f, y=%.2f, z=%.2f%s  "
+                                   "heading: %.1f°  rotation: %.1f°  ts=%s",
+                                   latest_accel['x'], latest_accel['y'], latest_accel['z'],
+                                   corrected_gyro['x'], corrected_gyro['y'], corrected_gyro['z'], cal_indicator,
+                                   latest_heading, current_rotation, j.get('ts',0))
 
             # --- Encoders ---
-            elif j.get('type') == 'encoders':
+            elif msg_type is MSG_ENCODERS:
                 counts = j.get('counts') or j.get('encoders') or {}
                 # Normalize to m1..m4 keys
                 normalized = {
@@ -420,31 +557,72 @@ def telem_loop(verbose=True):
                     'm4': int(counts.get('m4', 0) or 0),
                 }
                 latest_encoders.update(normalized)
+                latest_encoder_pair = (normalized['m1'], normalized['m2'])
                 last_enc_time = time.time()
+                encoder_event.set()
                 if verbose:
-                    print(f"ENC m1={latest_encoders['m1']} m2={latest_encoders['m2']} m3={latest_encoders['m3']} m4={latest_encoders['m4']}  ts={j.get('ts',0)}")
+                    telem_log.info("ENC m1=%d m2=%d m3=%d m4=%d  ts=%s", normalized['m1'], normalized['m2'],
+                                   normalized['m3'], normalized['m4'], j.get('ts',0))
 
             # --- Alive Messages ---
-            elif j.get('type') == 'alive':
+            elif msg_type is MSG_ALIVE:
                 device = j.get('device', 'Unknown')
                 esp_ip = j.get('ip', 'Unknown')
                 timestamp = j.get('ts', 0)
                 if verbose:
-                    print(f"🤖 ALIVE: {device} at {esp_ip} (uptime: {timestamp}ms)")
+                    telem_log.info("🤖 ALIVE: %s at %s (uptime: %sms)", device, esp_ip, timestamp)
                 # Automatically update RPI_IP if we get an alive message
                 global RPI_IP
                 if esp_ip != 'Unknown' and esp_ip != RPI_IP:
-                    print(f"📡 Auto-updating ESP32 IP from {RPI_IP} to {esp_ip}")
+                    telem_log.info("📡 Auto-updating ESP32 IP from %s to %s", RPI_IP, esp_ip)
                     RPI_IP = esp_ip
 
         except socket.timeout:
-            print("⏰ No telemetry received in 5 seconds... still waiting")
+            telem_log.info("⏰ No telemetry received in 5 seconds... still waiting")
             continue
         except Exception as e:
+            if telem_stop.is_set():
+                break  # socket shut down by cleanup()
             if verbose:
-                print(f"Telemetry error: {e}")
+                telem_log.info("Telemetry error: %s", e)
             time.sleep(0.1)
 
+def ack_loop():
+    """Resolve move_by_ticks futures from the acks sent back to ctrl_sock."""
+    sock = ctrl_sock  # cleanup() resets the global
+    while not ack_stop.is_set():
+        try:
+            data, _ = sock.recvfrom(512)
+        except (ConnectionRefusedError, ConnectionResetError):
+            # ICMP port-unreachable from an earlier send (WSAECONNRESET on
+            # Windows); not fatal for a UDP socket
+            continue
+        except OSError:
+            if ack_stop.is_set() or sock.fileno() == -1:
+                return  # socket closed by cleanup()
+            time.sleep(0.1)
+            continue
+        try:
+            j = json.loads(data)
+        except ValueError:
+            continue
+        if j.get('type') != 'ack':
+            continue
+        with pending_moves_lock:
+            done = pending_moves.pop(j.get('seq'), None)
+        # False if the caller already cancelled it; afterwards cancel() can't win
+        if done is not None and done.set_running_or_notify_cancel():
+            done.set_result(j)
+
+def start_ack_thread():
+    global ack_thread
+    if ack_thread and ack_thread.is_alive():
+        return ack_thread
+    ack_stop.clear()
+    ack_thread = threading.Thread(target=ack_loop, daemon=True)
+    ack_thread.start()
+    return ack_thread
+
 def start_telemetry_thread(verbose=True):
     global telem_thread, telemetry_running
     
@@ -454,6 +632,7 @@ def start_telemetry_thread(verbose=True):
     
     print(f"Starting telemetry thread, listening on port {LOCAL_TELEM_PORT}")
     print(f"Will send commands to ESP32 at {RPI_IP}:{RPI_CTRL_PORT}")
+    telem_stop.clear()
     telem_thread = threading.Thread(target=telem_loop, args=(verbose,), daemon=True)
     telem_thread.start()
     telemetry_running = True
@@ -582,6 +761,7 @@ def init_bot_control(verbose_telemetry=True):
     
     initialize_sockets()
     start_telemetry_thread(verbose_telemetry)
+    start_ack_thread()
     
     # Try to load gyro calibration
     load_gyro_calibration()
@@ -590,10 +770,35 @@ def init_bot_control(verbose_telemetry=True):
     print(f"Motor factors: LEFT={MOTOR_FACTOR_LEFT}, RIGHT={MOTOR_FACTOR_RIGHT}, MAX_SPEED={MOTOR_MAX_SPEED}")
     return True
 
+def _close_socket(sock):
+    """Shut down and close sock; shutdown() wakes a thread blocked receiving on it."""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # unconnected UDP reports ENOTCONN but still wakes readers
+    sock.close()
+
 def cleanup():
+    global ctrl_sock, ctrl_peer, telem_sock, telem_thread, telemetry_running, ack_thread
     stop_motors()
-    if ctrl_sock: ctrl_sock.close()
-    if telem_sock: telem_sock.close()
+    # End telem_loop before its logging listener so nothing logs into an undrained queue
+    telem_stop.set()
+    if telem_sock:
+        _close_socket(telem_sock)
+        telem_sock = None
+    if telem_thread:
+        telem_thread.join(timeout=1.0)
+        telem_thread = None
+    telemetry_running = False
+    ack_stop.set()
+    if ctrl_sock:
+        _close_socket(ctrl_sock)  # wakes ack_loop so it sees ack_stop
+        ctrl_sock = None
+        ctrl_peer = None
+    if ack_thread:
+        ack_thread.join(timeout=1.0)
+        ack_thread = None
+    stop_telemetry_logging()
 
 if __name__ == '__main__':
     try:
@@ -49,8 +49,8 @@ def get_encoder_snapshot() -> Tuple[int, int]:
 
 def wait_for_turn_completion(target_ticks: int, start_left: int, start_right: int,
                              timeout: float = 20.0) -> bool:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
         cur_left, cur_right = get_encoder_snapshot()
         left_delta = abs(cur_left - start_left)
         right_delta = abs(cur_right - start_right)
@@ -68,6 +68,17 @@ class RobotController:
         print(f"  Pulses per cm: {self.PULSES_PER_CM:.2f} (default {self.DEFAULT_PULSES_PER_CM:.2f})")
         print(f"  Pulses per degree rotation: {self.PULSES_PER_DEGREE}")
     
+    def __enter__(self):
+        """Start bot control; its one connected control socket serves every command."""
+        init_bot_control(verbose_telemetry=False)
+        wait_for_encoder_data(timeout=5.0)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        """Stop the motors and release the control and telemetry sockets."""
+        cleanup()
+        return False
+    
     def configure_tolerances(self, rotation_tolerance=None, distance_tolerance=None):
         """Configure tolerance values for rotation and distance"""
         if rotation_tolerance is not None:
@@ -232,11 +243,11 @@ class RobotController:
         
         # Wait for movement to complete (ESP32 handles the control loop)
         # Poll encoders to detect completion
-        start_time = time.time()
+        deadline = time.monotonic() + self.max_turn_time
         last_check_ticks = 0.0
         stall_count = 0
         
-        while time.time() - start_time < self.max_turn_time:
+        while time.monotonic() < deadline:
             rel_left, rel_right = self.get_relative_position()
             avg_ticks = (abs(rel_left) + abs(rel_right)) / 2.0
             
@@ -384,10 +395,10 @@ class RobotController:
             send_motor(left_speed, right_speed)
             
             # Monitor correction progress
-            start_time = time.time()
             max_correction_time = 3.0  # Shorter timeout for corrections
+            deadline = time.monotonic() + max_correction_time
             
-            while time.time() - start_time < max_correction_time:
+            while time.monotonic() < deadline:
                 rel_left, rel_right = self.get_relative_position()
                 
                 # Calculate current correction ticks using weighted average
@@ -460,11 +471,11 @@ class RobotController:
         move_by_ticks(left_ticks, right_ticks, left_speed, right_speed)
 
         # Wait for movement to complete (ESP32 handles the control loop)
-        start_time = time.time()
+        deadline = time.monotonic() + self.max_move_time
         last_check_ticks = 0.0
         stall_count = 0
 
-        while time.time() - start_time < self.max_move_time:
+        while time.monotonic() < deadline:
             rel_left, rel_right = self.get_relative_position()
             avg_ticks = (abs(rel_left) + abs(rel_right)) / 2.0
 
@@ -16,6 +16,22 @@ import os
 import json
 import math
 import csv
+import functools
+import importlib
+import struct
+import sys
+from collections import defaultdict
+from array import array
+
+try:
+    import orjson as _json  # fast loader for config reads; stdlib json still used for writing
+except ImportError:
+    _json = json
+
+# Optional JIT for very long checkpoint lists; the planner itself only needs the
+# stdlib. numpy/numba are imported on first use (see _jit_segments_kernel) so
+# importing the planner stays cheap.
+np = None
 
 # Arena size (cm)
 ARENA_WIDTH_CM = 118.1
@@ -32,6 +48,14 @@ NO_GO_CLEARANCE_CM = 8.0
 # Grid-based routing parameters
 GRID_STEP_CM = 1.0  # grid resolution; finer yields better paths, higher compute
 
+# Use the compiled segment kernel only for polylines at least this long;
+# below it the JIT dispatch and list conversion cost more than they save
+JIT_MIN_POINTS = 256
+
+# path.csv.bin header: magic, then the CSV's st_mtime_ns and st_size it was built from
+_PATH_CACHE_HEADER = struct.Struct("<8sqq")
+_PATH_CACHE_MAGIC = b"PATHBIN1"
+
 
 def _dist(a, b):
     ax, ay = a; bx, by = b
@@ -183,19 +207,105 @@ def _distance_segment_to_rect(a, b, rect):
     return dist
 
 
+def _obstacle_outside_box(obs, xmin, xmax, ymin, ymax, clearance):
+    """True if obs lies entirely outside the segment bounding box grown by clearance.
+
+    Such an obstacle is farther than clearance from every point of the segment.
+    """
+    if obs["type"] == "point":
+        ox, oy = obs["x"], obs["y"]
+        return (ox < xmin - clearance or ox > xmax + clearance or
+                oy < ymin - clearance or oy > ymax + clearance)
+    return (obs["xmax"] < xmin - clearance or obs["xmin"] > xmax + clearance or
+            obs["ymax"] < ymin - clearance or obs["ymin"] > ymax + clearance)
+
+
+def _build_obstacle_grid(obstacles, cell):
+    """Map grid cell -> obstacle indices for every cell an obstacle's clearance zone touches."""
+    grid = defaultdict(list)
+    default_clear = max(MIN_CLEARANCE_CM, OBSTACLE_RADIUS_CM + AVOID_MARGIN_CM)
+    for idx, obs in enumerate(obstacles):
+        # tiny pad so zones that only touch a cell corner still register in every adjacent cell
+        c = obs.get("clearance", default_clear) + 1e-6
+        if obs["type"] == "point":
+            xmin = xmax = obs["x"]
+            ymin = ymax = obs["y"]
+        else:
+            xmin, xmax, ymin, ymax = obs["xmin"], obs["xmax"], obs["ymin"], obs["ymax"]
+        for gx in range(math.floor((xmin - c) / cell), math.floor((xmax + c) / cell) + 1):
+            for gy in range(math.floor((ymin - c) / cell), math.floor((ymax + c) / cell) + 1):
+                grid[(gx, gy)].append(idx)
+    return dict(grid)
+
+
+def _cells_on_segment(a, b, cell):
+    """Grid cells crossed by segment AB (Amanatides-Woo voxel walk)."""
+    x0, y0 = a[0] / cell, a[1] / cell
+    x1, y1 = b[0] / cell, b[1] / cell
+    cx, cy = math.floor(x0), math.floor(y0)
+    ex, ey = math.floor(x1), math.floor(y1)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    inf = float("inf")
+    t_max_x = ((cx + (step_x > 0)) - x0) / dx if dx else inf
+    t_max_y = ((cy + (step_y > 0)) - y0) / dy if dy else inf
+    t_dx = abs(1.0 / dx) if dx else inf
+    t_dy = abs(1.0 / dy) if dy else inf
+    cells = [(cx, cy)]
+    for _ in range(abs(ex - cx) + abs(ey - cy)):
+        if cy == ey or (cx != ex and t_max_x < t_max_y):
+            cx += step_x
+            t_max_x += t_dx
+        else:
+            cy += step_y
+            t_max_y += t_dy
+        cells.append((cx, cy))
+    return cells
+
+
+class _GriddedObstacles(list):
+    """Obstacle list carrying a uniform-grid index for segment clearance queries.
+
+    Build it once the obstacle set is final; the index does not track later
+    list mutations.
+    """
+
+    def __init__(self, obstacles, cell=MIN_CLEARANCE_CM):
+        super().__init__(obstacles)
+        self.cell = cell
+        self.grid = _build_obstacle_grid(self, cell)
+
+
+def _segment_candidates(a, b, obstacles):
+    """Obstacles that may lie within clearance of AB (all of them without a grid)."""
+    grid = getattr(obstacles, "grid", None)
+    if grid is None:
+        return obstacles
+    hits = set()
+    for key in _cells_on_segment(a, b, obstacles.cell):
+        hits.update(grid.get(key, ()))
+    return [obstacles[i] for i in sorted(hits)]
+
+
 def _segment_penalty(a, b, obstacles):
     if not obstacles:
         return 0.0
-    penalty = 0.0
+    obstacles = _segment_candidates(a, b, obstacles)
+    xmin, xmax = min(a[0], b[0]), max(a[0], b[0])
+    ymin, ymax = min(a[1], b[1]), max(a[1], b[1])
+    overshoot = 0.0
     for obs in obstacles:
+        clearance = obs.get("clearance", OBSTACLE_RADIUS_CM + AVOID_MARGIN_CM)
+        if _obstacle_outside_box(obs, xmin, xmax, ymin, ymax, clearance):
+            continue
         if obs["type"] == "point":
             dmin = _distance_point_to_segment(obs["x"], obs["y"], a, b)
         else:
             dmin = _distance_segment_to_rect(a, b, obs)
-        clearance = obs.get("clearance", OBSTACLE_RADIUS_CM + AVOID_MARGIN_CM)
-        if dmin < clearance:
-            penalty += PENALTY_WEIGHT * (clearance - dmin)
-    return penalty
+        # Clip at zero instead of branching; scale once after summing
+        overshoot += max(clearance - dmin, 0.0)
+    return PENALTY_WEIGHT * overshoot
 
 
 def _segment_min_clearance(a, b, obstacles):
@@ -215,8 +325,13 @@ def _segment_min_clearance(a, b, obstacles):
 
 def _segment_is_clear(a, b, obstacles):
     """Return True if segment AB keeps the required clearance from all obstacles."""
+    obstacles = _segment_candidates(a, b, obstacles)
+    xmin, xmax = min(a[0], b[0]), max(a[0], b[0])
+    ymin, ymax = min(a[1], b[1]), max(a[1], b[1])
     for obs in obstacles:
         clearance = obs.get("clearance", MIN_CLEARANCE_CM)
+        if _obstacle_outside_box(obs, xmin, xmax, ymin, ymax, clearance):
+            continue
         if obs["type"] == "point":
             dmin = _distance_point_to_segment(obs["x"], obs["y"], a, b)
         else:
@@ -235,6 +350,54 @@ def _polyline_length(path):
     return total
 
 
+def _segments_kernel(pts, start_heading_deg):
+    n = max(pts.shape[0] - 1, 0)
+    out = np.empty((n, 2))
+    heading = start_heading_deg
+    for i in range(n):
+        dx = pts[i + 1, 0] - pts[i, 0]
+        dy = pts[i + 1, 1] - pts[i, 1]
+        abs_heading = math.degrees(math.atan2(dx, -dy)) % 360.0
+        out[i, 0] = (abs_heading - heading + 540.0) % 360.0 - 180.0
+        out[i, 1] = math.hypot(dx, dy)
+        heading = abs_heading
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _jit_segments_kernel():
+    """Compile _segments_kernel with numba on first call; None if unavailable."""
+    global np
+    try:
+        import numpy
+        from numba import njit
+    except ImportError:
+        return None
+    np = numpy  # the kernel reads np as a module global
+    return njit(cache=True)(_segments_kernel)
+
+
+def _segments_from_points(points, start_heading_deg=0.0):
+    """
+    Convert a checkpoint polyline into (relative_turn_deg, distance_cm) segments.
+
+    Headings follow the arena convention (0 deg = up, clockwise positive). The
+    first turn is relative to start_heading_deg.
+    """
+    if len(points) >= JIT_MIN_POINTS:
+        kernel = _jit_segments_kernel()
+        if kernel is not None:
+            out = kernel(np.asarray(points, dtype=np.float64), float(start_heading_deg))
+            return [tuple(row) for row in out.tolist()]
+    deltas = [(x1 - x0, y1 - y0) for (x0, y0), (x1, y1) in zip(points, points[1:])]
+    headings = [math.degrees(math.atan2(dx, -dy)) % 360.0 for dx, dy in deltas]
+    prev_headings = [start_heading_deg] + headings[:-1]
+    return [
+        ((h - prev + 540.0) % 360.0 - 180.0, math.hypot(dx, dy))
+        for h, prev, (dx, dy) in zip(headings, prev_headings, deltas)
+    ]
+
+
 def _build_occupancy(obstacles, step=GRID_STEP_CM):
     """Return occupancy grid and helpers for planning. True=blocked."""
     gw = int(math.ceil(ARENA_WIDTH_CM / step)) + 1
@@ -382,9 +545,16 @@ def read_color_csv(script_dir, name):
     return pts
 
 
+# fruit_ui.py's layout constants supply the greens when green.csv is absent
+_FRUIT_UI_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fruit_ui.py")
+
+
 def synthesize_greens_from_fruit_ui():
     greens = []
     try:
+        if "fruit_ui" in sys.modules:
+            # Pick up edits made to fruit_ui.py since it was first imported
+            importlib.reload(sys.modules["fruit_ui"])
         from fruit_ui import TOP_Y_CM as FU_TOP, SPACING_CM_DEFAULT as FU_SP, OFFSETS_FROM_RIGHT_CM as FU_OFF, ARENA_WIDTH_CM as FU_W
         cols_x = [FU_W - FU_OFF[0], FU_W - FU_OFF[1]]
         for x in cols_x:
@@ -395,7 +565,18 @@ def synthesize_greens_from_fruit_ui():
     return greens
 
 
-def load_fruits_for_overlay(script_dir):
+def _file_key(path):
+    """(st_mtime_ns, st_size) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@functools.lru_cache(maxsize=4)
+def _load_fruits_cached(script_dir, file_keys):
+    # file_keys is only part of the cache key; a changed, new or removed file forces a reload
     reds = read_color_csv(script_dir, "red.csv")
     blacks = read_color_csv(script_dir, "black.csv")
     greens = []
@@ -404,25 +585,77 @@ def load_fruits_for_overlay(script_dir):
         greens = read_color_csv(script_dir, "green.csv")
     else:
         greens = synthesize_greens_from_fruit_ui()
-    return reds, blacks, greens
+    return tuple(reds), tuple(blacks), tuple(greens)
+
+
+def load_fruits_for_overlay(script_dir):
+    """Return (reds, blacks, greens) point lists, re-reading sources only when they change."""
+    file_keys = tuple(_file_key(os.path.join(script_dir, name))
+                      for name in ("red.csv", "black.csv", "green.csv"))
+    if file_keys[2] is None:
+        file_keys += (_file_key(_FRUIT_UI_SOURCE),)  # greens come from fruit_ui
+    reds, blacks, greens = _load_fruits_cached(script_dir, file_keys)
+    return list(reds), list(blacks), list(greens)
+
+
+def read_path_csv(path_csv):
+    """
+    Load (turn_deg, distance_cm) segments from a path.csv file.
+
+    Parsed values are cached next to the CSV as raw float64 pairs
+    (``path.csv.bin``) behind a header recording the CSV's exact mtime (ns) and
+    size; the cache is reused only while both still match, so an edit within
+    the mtime granularity or a restore with an older mtime is never missed.
+    Returns [] if the CSV does not exist.
+    """
+    try:
+        st = os.stat(path_csv)
+    except OSError:
+        return []
+    header = _PATH_CACHE_HEADER.pack(_PATH_CACHE_MAGIC, st.st_mtime_ns, st.st_size)
+    cache = path_csv + ".bin"
+    try:
+        with open(cache, "rb") as f:
+            raw = f.read()
+        if raw[:_PATH_CACHE_HEADER.size] == header:
+            flat = array("d")
+            flat.frombytes(raw[_PATH_CACHE_HEADER.size:])
+            return list(zip(flat[0::2], flat[1::2]))
+    except (OSError, ValueError):
+        pass
+
+    segments = []
+    with open(path_csv, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            turn = float(row.get("turn_deg", 0.0))
+            distance = float(row.get("distance_cm", 0.0))
+            segments.append((turn, distance))
+    flat = array("d", [v for seg in segments for v in seg])
+    try:
+        with open(cache, "wb") as f:
+            f.write(header)
+            flat.tofile(f)
+    except OSError:
+        pass
+    return segments
+
+
+def _write_pairs_csv(out, header, pairs):
+    """Write a two-column CSV in one buffered write (same bytes as csv.writer)."""
+    body = "".join(f"{a:.2f},{b:.2f}\r\n" for a, b in pairs)
+    with open(out, "w", newline="") as f:
+        f.write(f"{header[0]},{header[1]}\r\n" + body)
 
 
 def write_checkpoints(script_dir, pts_cm):
     out = os.path.join(script_dir, "checkpoints_cm.csv")
-    with open(out, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["x_cm", "y_cm"]) 
-        for (x, y) in pts_cm:
-            w.writerow([f"{x:.2f}", f"{y:.2f}"])
+    _write_pairs_csv(out, ("x_cm", "y_cm"), pts_cm)
 
 
 def write_path(script_dir, segs):
     out = os.path.join(script_dir, "path.csv")
-    with open(out, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["turn_deg", "distance_cm"]) 
-        for (t, d) in segs:
-            w.writerow([f"{t:.2f}", f"{d:.2f}"])
+    _write_pairs_csv(out, ("turn_deg", "distance_cm"), segs)
 
 
 def load_no_go_zones(script_dir):
@@ -472,8 +705,8 @@ def load_path_config(script_dir, defaults=None):
     if not os.path.exists(cfg_path):
         return defaults
     try:
-        with open(cfg_path, "r") as f:
-            data = json.load(f)
+        with open(cfg_path, "rb") as f:
+            data = _json.loads(f.read())
         s = data.get("start_cm") or []
         e = data.get("end_cm") or []
         start = (float(s[0]), float(s[1])) if len(s) == 2 else defaults[0]
@@ -583,34 +816,40 @@ def build_auto_path(script_dir, start_xy=None, end_xy=None, final_dest_xy=None,
         obstacles.append(_make_point_obstacle(nx, ny, nogo_clearance))
     for (x1, y1, x2, y2) in nogo_rects:
         obstacles.append(_make_rect_obstacle(x1, y1, x2, y2, nogo_clearance))
+    obstacles = _GriddedObstacles(obstacles)
 
     if not reds:
         return [], []
 
     # Greedy selection by actual routed path length (A*), favoring feasible and maximally clear legs
-    remaining = reds[:]
+    # alive[i] marks reds[i] as not yet visited; indices stay stable across picks
+    alive = [True] * len(reds)
     order = []
     cur = start_xy
-    while remaining:
+    for _ in range(len(reds)):
         scored = []
-        for r in remaining:
+        for idx, r in enumerate(reds):
+            if not alive[idx]:
+                continue
             poly = _plan_segment_with_clearance(cur, r, obstacles)
             if poly is None:
                 continue
-            scored.append((_polyline_length(poly), r, poly))
+            scored.append((_polyline_length(poly), idx, poly))
         if not scored:
             # fallback: choose nearest by Euclidean distance
-            chosen = min(remaining, key=lambda r: _dist(cur, r))
+            chosen_idx = min((i for i in range(len(reds)) if alive[i]), key=lambda i: _dist(cur, reds[i]))
+            chosen = reds[chosen_idx]
             poly = [cur, chosen] if _segment_is_clear(cur, chosen, obstacles) else _plan_segment_with_clearance(cur, chosen, obstacles)
         else:
             scored.sort(key=lambda t: t[0])
-            _, chosen, poly = scored[0]
+            _, chosen_idx, poly = scored[0]
+            chosen = reds[chosen_idx]
         # Append intermediate waypoints (excluding current)
         if poly and len(poly) > 1:
             # Avoid duplicating cur
             for wp in poly[1:]:
                 order.append(wp)
-        remaining.remove(chosen)
+        alive[chosen_idx] = False
         cur = chosen
 
     # Validate last hop to end respects clearance; insert waypoints if needed
@@ -718,6 +957,7 @@ def build_auto_path(script_dir, start_xy=None, end_xy=None, final_dest_xy=None,
             black_obstacles.append(_make_point_obstacle(nx, ny, nogo_clearance))
         for (x1, y1, x2, y2) in nogo_rects:
             black_obstacles.append(_make_rect_obstacle(x1, y1, x2, y2, nogo_clearance))
+        black_obstacles = _GriddedObstacles(black_obstacles)
         
         # Route through black fruits using greedy nearest neighbor
         if blacks:
@@ -754,26 +994,13 @@ def build_auto_path(script_dir, start_xy=None, end_xy=None, final_dest_xy=None,
                     checkpoints.append(wp)
 
     # Build path relative turns
-    segs = []
-    heading_deg = 0.0  # start facing up
-    for i in range(1, len(checkpoints)):
-        x0, y0 = checkpoints[i - 1]
-        x1, y1 = checkpoints[i]
-        dx = x1 - x0
-        dy = y1 - y0
-        abs_heading = (math.degrees(math.atan2(dx, -dy)) % 360.0)
-        rel_turn = (abs_heading - heading_deg + 540.0) % 360.0 - 180.0
-        seg_dist = math.hypot(dx, dy)
-        
-        # Special case: reverse segment (negative distance)
-        if reverse_checkpoint_idx is not None and i == reverse_checkpoint_idx:
-            # This is the reverse segment - make distance negative
-            seg_dist = -seg_dist
-            # No turn needed for pure reverse
-            rel_turn = 0.0
-        
-        segs.append((rel_turn, seg_dist))
-        heading_deg = abs_heading
+    segs = _segments_from_points(checkpoints)
+    
+    # Special case: reverse segment (negative distance)
+    if reverse_checkpoint_idx is not None and 1 <= reverse_checkpoint_idx <= len(segs):
+        # This is the reverse segment - make distance negative, no turn needed for pure reverse
+        _, seg_dist = segs[reverse_checkpoint_idx - 1]
+        segs[reverse_checkpoint_idx - 1] = (0.0, -seg_dist)
 
     # Validate clearance for all segments
     print(f"\n📏 Validating path clearance ({len(checkpoints)-1} segments)...")
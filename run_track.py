@@ -18,7 +18,7 @@ import os
 try:
     from move_control import RobotController
     import advanced
-    from path_planner import build_auto_path
+    from path_planner import build_auto_path, read_path_csv
 except ImportError as e:
     print(f"ERROR: Required modules not found: {e}")
     print("Make sure move_control.py, advanced.py, and path_planner.py are in the same directory.")
@@ -39,17 +39,7 @@ class PathFollower:
         return path_csv, checkpoints_csv
 
     def _read_path_csv(self, path_csv):
-        segments = []
-        try:
-            with open(path_csv, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    turn = float(row.get("turn_deg", 0.0))
-                    dist = float(row.get("distance_cm", 0.0))
-                    segments.append((turn, dist))
-        except FileNotFoundError:
-            return []
-        return segments
+        return read_path_csv(path_csv)
 
     def _read_checkpoints_csv(self, checkpoints_csv):
         checkpoints = []
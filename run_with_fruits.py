@@ -10,12 +10,16 @@ import os
 import sys
 import time
 import csv
-import json
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 try:
     from move_control import RobotController
     import advanced
-    from path_planner import build_auto_path
+    from path_planner import build_auto_path, read_path_csv
 except ImportError as e:
     print(f"ERROR: Required modules not found: {e}")
     sys.exit(1)
@@ -36,8 +40,8 @@ class FruitTrackRunner:
             print(f"ERROR: Config file {self.config_file} not found. Run fruit_ui.py first.")
             sys.exit(1)
 
-        with open(self.config_file, "r") as f:
-            self.fruit_config = json.load(f)
+        with open(self.config_file, "rb") as f:
+            self.fruit_config = _json.loads(f.read())
 
         print("Loaded fruit config:", self.fruit_config)
 
@@ -48,17 +52,7 @@ class FruitTrackRunner:
         )
 
     def _read_path_csv(self, path_csv):
-        segments = []
-        try:
-            with open(path_csv, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    turn = float(row.get("turn_deg", 0.0))
-                    distance = float(row.get("distance_cm", 0.0))
-                    segments.append((turn, distance))
-        except FileNotFoundError:
-            return []
-        return segments
+        return read_path_csv(path_csv)
 
     def _read_checkpoints_csv(self, checkpoints_csv):
         checkpoints = []
@@ -6,16 +6,123 @@ and sends encoder/IMU/LIDAR telemetry matching the real robot's protocol.
 """
 from __future__ import annotations
 
+import ctypes
 import json
+import os
+import selectors
 import socket
+import sys
 import threading
 import time
 from typing import TYPE_CHECKING
 
+try:
+    import orjson as _json  # parses command bytes directly
+except ImportError:
+    _json = json
+
 if TYPE_CHECKING:
     from virtual_robot import VirtualRobot
 
 
+# Telemetry payloads have a fixed shape, so format them straight into bytes
+# instead of building a dict and running json.dumps on every tick.
+_ENCODER_TMPL = (b'{"type":"encoders","counts":{"m1":%d,"m2":%d,"m3":0,"m4":0,'
+                 b'"left":%d,"right":%d},"ts":%d}')
+_IMU_TMPL = (b'{"type":"imu","accel":{"x":0.0,"y":0.0,"z":9.81},'
+             b'"gyro":{"x":0.0,"y":0.0,"z":%r},"heading":%r,'
+             b'"mag":{"x":0.0,"y":0.0,"z":0.0},"temp_c":25.0,"ts":%d}')
+_ALIVE_TMPL = b'{"type":"alive","device":"SimulatedESP32","ip":"192.168.4.1","ts":%d}'  # AP-mode IP
+_ACK_TMPL = b'{"type":"ack","seq":%d,"ts":%d}'
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    """Return libc's sendmmsg() on Linux, or None where it is unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_sendmmsg = _load_sendmmsg()
+
+# UDP generic segmentation offload (Linux 4.18+): one sendmsg() carries several
+# equal-sized datagrams that the kernel splits on transmit. The socket module
+# only names the option on newer Pythons, so fall back to the Linux value.
+_UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103) if sys.platform.startswith("linux") else None
+GSO_SEGMENT_LEN = 256  # fits every telemetry message; shorter ones are space-padded
+
+CTRL_RCVBUF_BYTES = 1 << 20
+
+
+MMSG_BATCH_MAX = 16  # telemetry datagrams per sendmmsg() call; larger batches are split
+
+
+def _alloc_mmsg_arrays(size: int):
+    """Allocate iovec/mmsghdr arrays for sendmmsg(), one iovec per message.
+    
+    The msg_iov pointers are wired up here once; callers only fill in
+    iov_base/iov_len before each send.
+    """
+    iovs = (_IOVec * size)()
+    msgs = (_MMsgHdr * size)()
+    for i in range(size):
+        hdr = msgs[i].msg_hdr
+        hdr.msg_iov = ctypes.pointer(iovs[i])
+        hdr.msg_iovlen = 1
+    return iovs, msgs
+
+
+def _send_batch_mmsg(fd: int, payloads: list[bytes], iovs, msgs) -> None:
+    """Send all payloads as separate datagrams with as few sendmmsg() calls as possible.
+    
+    iovs/msgs come from _alloc_mmsg_arrays(); each iovec points straight at
+    the payload's bytes, which the caller keeps alive for the whole call.
+    The socket must be connected; no per-message destination is set.
+    """
+    cap = len(msgs)
+    for start in range(0, len(payloads), cap):
+        chunk = payloads[start:start + cap]
+        n = len(chunk)
+        for i, data in enumerate(chunk):
+            iov = iovs[i]
+            iov.iov_base = ctypes.cast(data, ctypes.c_void_p).value
+            iov.iov_len = len(data)
+        sent = 0
+        while sent < n:
+            rc = _sendmmsg(fd, ctypes.byref(msgs[sent]), n - sent, 0)
+            if rc < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            sent += rc
+
+
 class MockESP32:
     """Mock ESP32 UDP server for simulation."""
     
@@ -32,8 +139,7 @@ class MockESP32:
         self.telem_sock: socket.socket | None = None
         
         self.running = False
-        self.ctrl_thread: threading.Thread | None = None
-        self.telem_thread: threading.Thread | None = None
+        self.io_thread: threading.Thread | None = None
         
         # Telemetry parameters
         self.encoder_interval = 0.05  # 50ms = 20 Hz
@@ -44,6 +150,23 @@ class MockESP32:
         self.imu_heading = 0.0
         self.prev_robot_heading = 0.0
         
+        # Telemetry queued during one loop tick, flushed together by _flush_batch()
+        self._pending: list[bytes] = []
+        self._telem_addr = (pc_ip, telem_port)
+        self._telem_connected = False
+        self._use_gso = _UDP_SEGMENT is not None
+        # sendmmsg() arrays, allocated once and refilled on every flush
+        self._mmsg_arrays = _alloc_mmsg_arrays(MMSG_BATCH_MAX) if _sendmmsg is not None else None
+        
+        # Command type -> handler, looked up once per packet (move_ticks is
+        # dispatched in _handle_command because its ack is deferred)
+        self._handlers = {
+            'motor': self._do_motor,
+            'motor4': self._do_motor4,
+            'servo': self._do_ignored,
+            'stepper': self._do_ignored,
+        }
+        
     def start(self) -> None:
         """Start mock ESP32 server."""
         if self.running:
@@ -53,18 +176,26 @@ class MockESP32:
         
         # Create control socket (listens for commands)
         self.ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Large receive buffer so a burst of teleop commands isn't dropped
+        # while the loop is busy; reads never block (see _drain_commands)
+        self.ctrl_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, CTRL_RCVBUF_BYTES)
+        self.ctrl_sock.setblocking(False)
         self.ctrl_sock.bind(('0.0.0.0', self.ctrl_port))
-        self.ctrl_sock.settimeout(0.1)
         
         # Create telemetry socket (sends data to PC)
         self.telem_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._telem_addr = (self.pc_ip, self.telem_port)
+        try:
+            # Fix the destination once so each send skips address handling
+            self.telem_sock.connect(self._telem_addr)
+            self._telem_connected = True
+        except OSError as e:
+            print(f"Telemetry connect failed ({e}); falling back to sendto")
+            self._telem_connected = False
         
-        # Start threads
-        self.ctrl_thread = threading.Thread(target=self._control_loop, daemon=True)
-        self.telem_thread = threading.Thread(target=self._telemetry_loop, daemon=True)
-        
-        self.ctrl_thread.start()
-        self.telem_thread.start()
+        # One thread serves both sockets; see _io_loop
+        self.io_thread = threading.Thread(target=self._io_loop, daemon=True)
+        self.io_thread.start()
         
         print(f"Mock ESP32 started: control={self.ctrl_port}, telemetry={self.telem_port}")
         print(f"Telemetry target: {self.pc_ip}:{self.telem_port}")
@@ -72,117 +203,141 @@ class MockESP32:
     def stop(self) -> None:
         """Stop mock ESP32 server."""
         self.running = False
-        if self.ctrl_thread:
-            self.ctrl_thread.join(timeout=1.0)
-        if self.telem_thread:
-            self.telem_thread.join(timeout=1.0)
+        if self.io_thread:
+            self.io_thread.join(timeout=1.0)
         if self.ctrl_sock:
             self.ctrl_sock.close()
         if self.telem_sock:
             self.telem_sock.close()
         print("Mock ESP32 stopped")
     
-    def _control_loop(self) -> None:
-        """Listen for and handle control commands."""
-        while self.running:
+    def _io_loop(self) -> None:
+        """Send telemetry on schedule and handle commands as they arrive.
+        
+        The selector wait doubles as the telemetry timer: it returns when a
+        command is readable or the next telemetry message is due.
+        """
+        sel = selectors.DefaultSelector()
+        sel.register(self.ctrl_sock, selectors.EVENT_READ)
+        
+        # Absolute monotonic deadlines: each stream advances by its own
+        # interval, so the wait never drifts with loop overhead or clock steps.
+        # After a stall the next deadline is a full interval after the late
+        # send, so catching up never sends two packets back to back.
+        start_time = time.monotonic()
+        next_encoder = next_imu = next_alive = start_time
+        
+        try:
+            while self.running:
+                current_time = time.monotonic()
+                now_ms = int(time.time() * 1000)  # one wall-clock stamp per tick
+                
+                # Send encoder telemetry
+                if current_time >= next_encoder:
+                    self._send_encoder_telemetry(now_ms)
+                    next_encoder = max(next_encoder + self.encoder_interval, current_time + self.encoder_interval)
+                
+                # Send IMU telemetry
+                if current_time >= next_imu:
+                    self._send_imu_telemetry(now_ms)
+                    next_imu = max(next_imu + self.imu_interval, current_time + self.imu_interval)
+                
+                # Send alive message
+                if current_time >= next_alive:
+                    self._send_alive(int((current_time - start_time) * 1000))
+                    next_alive = max(next_alive + self.alive_interval, current_time + self.alive_interval)
+                
+                self._flush_batch()
+                
+                next_due = min(next_encoder, next_imu, next_alive)
+                if sel.select(timeout=max(0.0, next_due - time.monotonic())):
+                    self._drain_commands()
+        finally:
+            sel.close()
+    
+    def _drain_commands(self) -> None:
+        """Read and handle every control packet already queued on the socket."""
+        while True:
             try:
                 data, addr = self.ctrl_sock.recvfrom(2048)
-                msg = json.loads(data.decode())
-                self._handle_command(msg, addr)
-            except socket.timeout:
-                continue
-            except Exception as e:
+            except BlockingIOError:
+                return
+            except OSError as e:
                 if self.running:
                     print(f"Control loop error: {e}")
+                return
+            try:
+                msg = _json.loads(data)
+            except ValueError as e:
+                print(f"Control loop error: {e}")
+                continue
+            if not isinstance(msg, dict):
+                print(f"Control loop error: expected a JSON object, got {type(msg).__name__}")
+                continue
+            # This is the only IO thread; one malformed command must not end it
+            try:
+                self._handle_command(msg, addr)
+            except Exception as e:
+                print(f"Control loop error: bad {msg.get('type')!r} command: {e}")
     
     def _handle_command(self, msg: dict, addr: tuple) -> None:
-        """Handle incoming control command."""
+        """Handle incoming control command and ack it to the sender.
+        
+        Like the firmware, move_ticks is acked only once the move has ended;
+        every other command is acked straight away.
+        """
+        seq = int(msg.get('seq', 0))  # validated here, not when a deferred ack fires
         msg_type = msg.get('type')
+        if msg_type == 'move_ticks':
+            self._do_move_ticks(msg, lambda: self._send_ack(addr, seq))
+            return
+        handler = self._handlers.get(msg_type)
+        if handler is not None:
+            handler(msg)
+        self._send_ack(addr, seq)
+    
+    def _send_ack(self, addr: tuple, seq: int) -> None:
+        """Send a command ack (may be called from the physics thread)."""
+        try:
+            self.ctrl_sock.sendto(_ACK_TMPL % (seq, int(time.time() * 1000)), addr)
+        except OSError:
+            pass  # sender gone or socket closed during shutdown
+    
+    def _do_motor(self, msg: dict) -> None:
+        """Direct motor control."""
+        self.robot.set_motor_pwm(int(msg.get('left', 0)), int(msg.get('right', 0)))
+    
+    def _do_motor4(self, msg: dict) -> None:
+        """4-motor control (use first two motors)."""
+        self.robot.set_motor_pwm(int(msg.get('m1', 0)), int(msg.get('m2', 0)))
+    
+    def _do_move_ticks(self, msg: dict, on_done) -> None:
+        """Move by encoder ticks; on_done fires when the move ends.
         
-        if msg_type == 'motor':
-            # Direct motor control
-            left = msg.get('left', 0)
-            right = msg.get('right', 0)
-            self.robot.set_motor_pwm(left, right)
-            
-        elif msg_type == 'motor4':
-            # 4-motor control (use first two motors)
-            m1 = msg.get('m1', 0)
-            m2 = msg.get('m2', 0)
-            self.robot.set_motor_pwm(m1, m2)
-            
-        elif msg_type == 'move_ticks':
-            # Move by encoder ticks
-            left_ticks = msg.get('left_ticks', 0)
-            right_ticks = msg.get('right_ticks', 0)
-            left_speed = msg.get('left_speed', 0)
-            right_speed = msg.get('right_speed', 0)
-            self.robot.move_by_ticks(left_ticks, right_ticks, left_speed, right_speed)
-            
-        elif msg_type == 'servo':
-            # Servo control (ignored in simulation)
-            pass
-            
-        elif msg_type == 'stepper':
-            # Stepper control (ignored in simulation)
-            pass
+        Arguments are converted to int here, so bad values raise now rather
+        than later in the physics thread.
+        """
+        get = msg.get
+        self.robot.move_by_ticks(int(get('left_ticks', 0)), int(get('right_ticks', 0)),
+                                 int(get('left_speed', 0)), int(get('right_speed', 0)),
+                                 on_done)
+    
+    def _do_ignored(self, msg: dict) -> None:
+        """Servo and stepper commands have no effect in simulation."""
     
-    def _telemetry_loop(self) -> None:
-        """Send telemetry data to PC."""
-        last_encoder = 0.0
-        last_imu = 0.0
-        last_alive = 0.0
-        start_time = time.time()
-        
-        while self.running:
-            current_time = time.time()
-            
-            # Send encoder telemetry
-            if current_time - last_encoder >= self.encoder_interval:
-                self._send_encoder_telemetry()
-                last_encoder = current_time
-            
-            # Send IMU telemetry
-            if current_time - last_imu >= self.imu_interval:
-                self._send_imu_telemetry()
-                last_imu = current_time
-            
-            # Send alive message
-            if current_time - last_alive >= self.alive_interval:
-                self._send_alive(int((current_time - start_time) * 1000))
-                last_alive = current_time
-            
-            time.sleep(0.01)
-    
-    def _send_encoder_telemetry(self) -> None:
+    def _send_encoder_telemetry(self, now_ms: int) -> None:
         """Send encoder counts to PC."""
         left, right = self.robot.get_encoders()
-        msg = {
-            'type': 'encoders',
-            'counts': {
-                'm1': left,
-                'm2': right,
-                'm3': 0,
-                'm4': 0,
-                'left': left,
-                'right': right,
-            },
-            'ts': int(time.time() * 1000)
-        }
-        self._send_telemetry(msg)
+        self._send_telemetry_bytes(_ENCODER_TMPL % (left, right, left, right, now_ms))
     
-    def _send_imu_telemetry(self) -> None:
+    def _send_imu_telemetry(self, now_ms: int) -> None:
         """Send simulated IMU data to PC."""
         # Get robot heading and compute gyro z-axis
         _, _, current_heading = self.robot.get_pose()
         
         # Compute angular velocity (degrees per second)
-        heading_delta = current_heading - self.prev_robot_heading
-        # Handle wrap-around
-        if heading_delta > 180:
-            heading_delta -= 360
-        elif heading_delta < -180:
-            heading_delta += 360
+        # Wrap into [-180, 180); Python's % keeps the result non-negative
+        heading_delta = (current_heading - self.prev_robot_heading + 180.0) % 360.0 - 180.0
         
         gyro_z = heading_delta / self.imu_interval  # deg/s
         self.prev_robot_heading = current_heading
@@ -190,35 +345,76 @@ class MockESP32:
         # Update IMU heading (simulate magnetometer)
         self.imu_heading = current_heading
         
-        msg = {
-            'type': 'imu',
-            'accel': {'x': 0.0, 'y': 0.0, 'z': 9.81},  # Static, gravity only
-            'gyro': {'x': 0.0, 'y': 0.0, 'z': gyro_z},
-            'heading': self.imu_heading,
-            'mag': {'x': 0.0, 'y': 0.0, 'z': 0.0},
-            'temp_c': 25.0,
-            'ts': int(time.time() * 1000)
-        }
-        self._send_telemetry(msg)
+        # Accel is static (gravity only); see _IMU_TMPL
+        self._send_telemetry_bytes(_IMU_TMPL % (float(gyro_z), float(self.imu_heading), now_ms))
     
     def _send_alive(self, uptime_ms: int) -> None:
         """Send alive/heartbeat message."""
-        msg = {
-            'type': 'alive',
-            'device': 'SimulatedESP32',
-            'ip': '192.168.4.1',  # Simulate AP mode
-            'ts': uptime_ms
-        }
-        self._send_telemetry(msg)
+        self._send_telemetry_bytes(_ALIVE_TMPL % uptime_ms)
+    
+    def _send_telemetry_bytes(self, data: bytes) -> None:
+        """Queue an already-serialized telemetry payload."""
+        self._pending.append(data)
     
-    def _send_telemetry(self, msg: dict) -> None:
-        """Send telemetry message to PC."""
+    def _flush_batch(self) -> None:
+        """Send all queued telemetry with as few syscalls as the platform allows.
+        
+        Tried in order:
+        - UDP GSO (Linux): a batch of two or more messages goes out as one
+          segmented sendmsg(). This is the normal path for multi-message ticks.
+        - sendmmsg() (Linux, connected socket): single-message batches, and
+          any batch once GSO is unsupported or a message exceeds
+          GSO_SEGMENT_LEN.
+        - One sendto()/send() per message: before the socket is connected,
+          and on platforms without either.
+        """
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
         try:
-            data = json.dumps(msg).encode()
-            self.telem_sock.sendto(data, (self.pc_ip, self.telem_port))
+            if self._use_gso and len(batch) > 1 and self._send_batch_gso(batch):
+                return
+            # GSO unavailable, declined or pointless for a single message
+            if not self._telem_connected:
+                for data in batch:
+                    self.telem_sock.sendto(data, self._telem_addr)
+            elif _sendmmsg is not None:
+                _send_batch_mmsg(self.telem_sock.fileno(), batch, *self._mmsg_arrays)
+            else:
+                for data in batch:
+                    self.telem_sock.send(data)
+        except ConnectionRefusedError:
+            # Connected UDP reports an earlier ICMP port-unreachable here; the
+            # PC just isn't listening yet, so drop this batch like sendto would
+            pass
         except Exception as e:
             if self.running:
                 print(f"Telemetry send error: {e}")
+    
+    def _send_batch_gso(self, batch: list[bytes]) -> bool:
+        """Send the batch as one UDP_SEGMENT super-datagram.
+        
+        Every message but the last is padded with JSON whitespace to
+        GSO_SEGMENT_LEN so the kernel can cut it back into the original
+        datagrams. Returns False if the batch has to be sent another way.
+        """
+        seg = GSO_SEGMENT_LEN
+        if any(len(data) > seg for data in batch):
+            return False
+        buf = b''.join(data.ljust(seg) for data in batch[:-1]) + batch[-1]
+        cmsg = [(socket.SOL_UDP, _UDP_SEGMENT, seg.to_bytes(2, sys.byteorder))]
+        try:
+            if self._telem_connected:
+                self.telem_sock.sendmsg([buf], cmsg)
+            else:
+                self.telem_sock.sendmsg([buf], cmsg, 0, self._telem_addr)
+        except ConnectionRefusedError:
+            raise
+        except OSError:
+            # Kernel or route without GSO support; stop trying
+            self._use_gso = False
+            return False
+        return True
 
 
 def main():
@@ -22,6 +22,14 @@ from simulator.mock_esp32 import MockESP32
 from simulator import sim_advanced as advanced
 
 
+def run_move(left_ticks: int, right_ticks: int, left_speed: float, right_speed: float,
+             timeout: float = 3.0) -> None:
+    """Send a move_by_ticks command and wait for its ack, warning if none comes."""
+    done = advanced.move_by_ticks(left_ticks, right_ticks, left_speed, right_speed)
+    if not advanced.wait_for_move(done, timeout):
+        print(f"     ⚠ Move not acknowledged within {timeout:.0f} s; continuing")
+
+
 def main():
     print("="*60)
     print("ROBOT SIMULATOR - QUICK START DEMO")
@@ -56,8 +64,7 @@ def main():
     print("  → Moving forward 30 cm...")
     ppc = robot.config.pulses_per_cm
     ticks = int(ppc * 30)
-    advanced.move_by_ticks(ticks, ticks, 40, 40)
-    time.sleep(2.0)
+    run_move(ticks, ticks, 40, 40)
     
     x, y, heading = robot.get_pose()
     print(f"     Position: ({x:.1f}, {y:.1f}) cm, heading {heading:.1f}°")
@@ -66,8 +73,7 @@ def main():
     print("  → Turning 90°...")
     ppd = robot.config.pulses_per_degree
     turn_ticks = int(ppd * 90)
-    advanced.move_by_ticks(turn_ticks, -turn_ticks, 35, -35)
-    time.sleep(2.0)
+    run_move(turn_ticks, -turn_ticks, 35, -35)
     
     x, y, heading = robot.get_pose()
     print(f"     Position: ({x:.1f}, {y:.1f}) cm, heading {heading:.1f}°")
@@ -75,8 +81,7 @@ def main():
     # Test 3: Move forward again
     print("  → Moving forward 20 cm...")
     ticks = int(ppc * 20)
-    advanced.move_by_ticks(ticks, ticks, 40, 40)
-    time.sleep(1.5)
+    run_move(ticks, ticks, 40, 40)
     
     x, y, heading = robot.get_pose()
     print(f"     Position: ({x:.1f}, {y:.1f}) cm, heading {heading:.1f}°")
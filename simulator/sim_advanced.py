@@ -48,6 +48,7 @@ from advanced import (
     send_motor_differential,
     send_motor4,
     move_by_ticks,
+    wait_for_move,
     set_servo_angle,
     stepper_steps,
     
@@ -61,6 +62,8 @@ from advanced import (
     get_latest_imu,
     get_latest_heading,
     get_latest_encoders,
+    get_latest_encoder_pair,
+    encoder_event,
     is_encoder_data_available,
     wait_for_encoder_data,
     get_full_imu_data,
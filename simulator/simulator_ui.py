@@ -6,6 +6,7 @@ and allows manual control for testing.
 """
 from __future__ import annotations
 
+import argparse
 import math
 import os
 import sys
@@ -13,6 +14,12 @@ import time
 
 import pygame as pg
 
+try:
+    # SDL2 GPU renderer; experimental pygame API, so treat it as optional
+    from pygame._sdl2.video import Renderer, Texture, Window
+except ImportError:
+    Renderer = Texture = Window = None
+
 # Add parent directory to path to import from main codebase
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -28,13 +35,33 @@ ARENA_HEIGHT_CM = 114.3
 ROBOT_LENGTH_CM = 10.0
 ROBOT_WIDTH_CM = 8.0
 
+# Frame rate while the robot is driving, and while it is standing still
+ACTIVE_FPS = 60
+IDLE_FPS = 15
+
+HELP_LINES = [
+    "Controls:",
+    "  W/A/S/D - Manual drive",
+    "  Space - Stop motors",
+    "  R - Reset robot to origin",
+    "  H - Toggle this help",
+    "  T - Toggle telemetry",
+    "  Q/Esc - Quit",
+    "",
+    "The mock ESP32 is running:",
+    "  Control: port 9000",
+    "  Telemetry: port 9001 → 127.0.0.1",
+]
+HELP_PADDING = 12
+HELP_LINE_HEIGHT = 20
+HELP_BOX_W = 320
+
 
 class SimulatorUI:
     """Pygame visualization of virtual robot in arena."""
     
-    def __init__(self):
+    def __init__(self, software: bool = False):
         pg.init()
-        pg.display.set_caption("Robot Simulator")
         
         # Load arena image
         script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -44,16 +71,44 @@ class SimulatorUI:
         if os.path.exists(arena_path):
             self.arena_img = pg.image.load(arena_path)
         
+        # Arena scaled to the current window, redone only on resize
+        self._scaled_arena: pg.Surface | None = None
+        self._scaled_size = (0, 0)
+        
         # Setup display
         info = pg.display.Info()
         self.win_w = int(info.current_w * 0.8)
         self.win_h = int(info.current_h * 0.8)
-        self.screen = pg.display.set_mode((self.win_w, self.win_h), pg.RESIZABLE)
+        
+        # Prefer the GPU renderer: it scales the arena texture and draws
+        # primitives on the graphics card. --sw forces the software blitter.
+        self.window = None
+        self.renderer = None if software else self._create_renderer()
+        self.screen: pg.Surface | None = None
+        self._arena_tex = None
+        if self.renderer is None:
+            pg.display.set_caption("Robot Simulator")
+            self.screen = pg.display.set_mode((self.win_w, self.win_h), pg.RESIZABLE)
+        elif self.arena_img:
+            self._arena_tex = Texture.from_surface(self.renderer, self.arena_img)
         
         # Fonts
         self.font = pg.font.SysFont(None, 20)
         self.font_small = pg.font.SysFont(None, 16)
         
+        # Help text never changes, so render it and its backdrop once
+        self._help_surfs = [
+            self._text(line, (240, 240, 240) if line.endswith(":") else (200, 200, 200))
+            for line in HELP_LINES
+        ]
+        overlay = pg.Surface(
+            (HELP_BOX_W, len(HELP_LINES) * HELP_LINE_HEIGHT + HELP_PADDING * 2), pg.SRCALPHA)
+        overlay.fill((10, 10, 15, 200))
+        self._help_overlay = self._image(overlay)
+        
+        # Telemetry lines as (text, image); a line is re-rendered only when its text changes
+        self._telem_surfs: list[tuple[str, pg.Surface | Texture | None] | None] = []
+        
         # Robot and ESP32
         self.config = RobotConfig()
         self.robot = VirtualRobot(self.config)
@@ -71,6 +126,13 @@ class SimulatorUI:
         # UI state
         self.show_help = True
         self.show_telemetry = True
+        self._idle = False  # set by render(): nothing on screen is moving
+        
+        # Robot outline in pixels, rebuilt only when the arena scale changes
+        self._robot_scale_key: tuple[float, float] | None = None
+        self._robot_length_px = 0.0
+        self._robot_corners: list[tuple[float, float]] = []
+        self._robot_tex: Texture | None = None  # GPU path: robot sprite at that scale
         
         print("Simulator started. Press H for help.")
     
@@ -123,18 +185,71 @@ class SimulatorUI:
             # Render
             self.render()
             
-            # Cap framerate
-            clock.tick(60)
+            # Cap framerate; drop to a low rate while nothing moves
+            idle = self._idle and self.manual_left == 0 and self.manual_right == 0
+            clock.tick(IDLE_FPS if idle else ACTIVE_FPS)
         
         self.cleanup()
     
+    def _create_renderer(self) -> Renderer | None:
+        """Open the window with SDL2's GPU renderer, or return None to draw in software."""
+        if Renderer is None:
+            return None
+        # Linear filtering, so the GPU-scaled arena looks like smoothscale
+        os.environ.setdefault("SDL_RENDER_SCALE_QUALITY", "1")
+        try:
+            self.window = Window("Robot Simulator", size=(self.win_w, self.win_h), resizable=True)
+            return Renderer(self.window, accelerated=1)
+        except RuntimeError as e:  # pg.error, or _sdl2's own error type
+            print(f"GPU renderer unavailable ({e}); using software rendering")
+            if self.window is not None:
+                self.window.destroy()
+                self.window = None
+            return None
+    
+    def _image(self, surf: pg.Surface) -> pg.Surface | Texture | None:
+        """Return surf in the form the active renderer draws (a Texture on the GPU path).
+        
+        SDL can't create a zero-width texture, so blank text lines become None.
+        """
+        if self.renderer is None:
+            return surf
+        if surf.get_width() == 0:
+            return None
+        return Texture.from_surface(self.renderer, surf)
+    
+    def _text(self, line: str, color: tuple[int, int, int]) -> pg.Surface | Texture | None:
+        """Render one line of small text for the active renderer."""
+        return self._image(self.font_small.render(line, True, color))
+    
+    def _blit(self, image: pg.Surface | Texture | None, x: int, y: int) -> None:
+        """Draw an image from _image/_text at (x, y)."""
+        if self.renderer is None:
+            self.screen.blit(image, (x, y))
+        elif image is not None:
+            image.draw(dstrect=(x, y))
+    
+    def _rect(self, color: tuple[int, int, int], rect: tuple[int, int, int, int], width: int = 0) -> None:
+        """Fill a rectangle, or outline it when width is non-zero."""
+        if self.renderer is None:
+            pg.draw.rect(self.screen, color, rect, width)
+        elif width:
+            self.renderer.draw_color = (*color, 255)
+            self.renderer.draw_rect(rect)
+        else:
+            self.renderer.draw_color = (*color, 255)
+            self.renderer.fill_rect(rect)
+    
     def render(self) -> None:
         """Render the simulation."""
-        # Clear screen
-        self.screen.fill((20, 20, 24))
-        
-        # Get window size
-        self.win_w, self.win_h = self.screen.get_size()
+        # Clear screen and get window size
+        if self.renderer is None:
+            self.screen.fill((20, 20, 24))
+            self.win_w, self.win_h = self.screen.get_size()
+        else:
+            self.renderer.draw_color = (20, 20, 24, 255)
+            self.renderer.clear()
+            self.win_w, self.win_h = self.window.size
         
         # Compute arena scaling
         if self.arena_img:
@@ -150,15 +265,20 @@ class SimulatorUI:
         arena_y = (self.win_h - arena_h) // 2
         
         # Draw arena
-        if self.arena_img:
-            scaled_arena = pg.transform.smoothscale(self.arena_img, (arena_w, arena_h))
-            self.screen.blit(scaled_arena, (arena_x, arena_y))
+        if self._arena_tex is not None:
+            # The GPU scales the texture as part of the copy
+            self._arena_tex.draw(dstrect=(arena_x, arena_y, arena_w, arena_h))
+        elif self.arena_img:
+            if (arena_w, arena_h) != self._scaled_size:
+                # convert() to the display format so every blit is a plain copy
+                self._scaled_arena = pg.transform.smoothscale(
+                    self.arena_img, (arena_w, arena_h)).convert()
+                self._scaled_size = (arena_w, arena_h)
+            self.screen.blit(self._scaled_arena, (arena_x, arena_y))
         else:
             # Draw placeholder arena
-            pg.draw.rect(self.screen, (40, 40, 44), 
-                        (arena_x, arena_y, arena_w, arena_h))
-            pg.draw.rect(self.screen, (80, 80, 84), 
-                        (arena_x, arena_y, arena_w, arena_h), 2)
+            self._rect((40, 40, 44), (arena_x, arena_y, arena_w, arena_h))
+            self._rect((80, 80, 84), (arena_x, arena_y, arena_w, arena_h), 2)
         
         # Draw coordinate system
         px_per_cm_x = arena_w / ARENA_WIDTH_CM
@@ -166,6 +286,8 @@ class SimulatorUI:
         
         # Draw robot
         state = self.robot.get_state()
+        self._idle = (state.left_speed_pwm == 0 and state.right_speed_pwm == 0
+                      and not state.move_active)
         self._draw_robot(state.x_cm, state.y_cm, state.heading_deg,
                         arena_x, arena_y, px_per_cm_x, px_per_cm_y)
         
@@ -177,7 +299,10 @@ class SimulatorUI:
         if self.show_help:
             self._draw_help()
         
-        pg.display.flip()
+        if self.renderer is None:
+            pg.display.flip()
+        else:
+            self.renderer.present()
     
     def _draw_robot(self, x_cm: float, y_cm: float, heading_deg: float,
                    arena_x: int, arena_y: int, px_per_cm_x: float, px_per_cm_y: float) -> None:
@@ -186,29 +311,38 @@ class SimulatorUI:
         screen_x = arena_x + x_cm * px_per_cm_x
         screen_y = arena_y + y_cm * px_per_cm_y
         
-        # Robot dimensions in pixels
-        length_px = ROBOT_LENGTH_CM * (px_per_cm_x + px_per_cm_y) / 2
-        width_px = ROBOT_WIDTH_CM * (px_per_cm_x + px_per_cm_y) / 2
+        # Robot dimensions in pixels only change with the window size
+        if self._robot_scale_key != (px_per_cm_x, px_per_cm_y):
+            self._robot_scale_key = (px_per_cm_x, px_per_cm_y)
+            length_px = ROBOT_LENGTH_CM * (px_per_cm_x + px_per_cm_y) / 2
+            width_px = ROBOT_WIDTH_CM * (px_per_cm_x + px_per_cm_y) / 2
+            self._robot_length_px = length_px
+            # Robot corners (local coordinates)
+            self._robot_corners = [
+                (-width_px/2, -length_px/2),  # rear left
+                (width_px/2, -length_px/2),   # rear right
+                (width_px/2, length_px/2),    # front right
+                (-width_px/2, length_px/2),   # front left
+            ]
+            if self.renderer is not None:
+                self._robot_tex = self._robot_sprite(length_px)
+        length_px = self._robot_length_px
+        
+        if self.renderer is not None:
+            # Rotate the cached sprite on the GPU (clockwise, like heading_deg)
+            size = self._robot_tex.width
+            self._robot_tex.draw(dstrect=(round(screen_x - size / 2), round(screen_y - size / 2), size, size),
+                                 angle=heading_deg)
+            return
         
         # Draw robot body
         heading_rad = math.radians(heading_deg)
-        
-        # Robot corners (local coordinates)
-        corners = [
-            (-width_px/2, -length_px/2),  # rear left
-            (width_px/2, -length_px/2),   # rear right
-            (width_px/2, length_px/2),    # front right
-            (-width_px/2, length_px/2),   # front left
-        ]
-        
-        # Rotate and translate to world coordinates
-        rotated = []
         cos_h = math.cos(heading_rad)
         sin_h = math.sin(heading_rad)
-        for dx, dy in corners:
-            rx = dx * cos_h - dy * sin_h
-            ry = dx * sin_h + dy * cos_h
-            rotated.append((screen_x + rx, screen_y + ry))
+        
+        # Rotate and translate to world coordinates
+        rotated = [(screen_x + dx * cos_h - dy * sin_h, screen_y + dx * sin_h + dy * cos_h)
+                   for dx, dy in self._robot_corners]
         
         # Draw body
         pg.draw.polygon(self.screen, (80, 120, 200), rotated)
@@ -216,8 +350,8 @@ class SimulatorUI:
         
         # Draw heading indicator (arrow)
         arrow_len = length_px * 0.6
-        arrow_x = screen_x + arrow_len * math.sin(heading_rad)
-        arrow_y = screen_y - arrow_len * math.cos(heading_rad)
+        arrow_x = screen_x + arrow_len * sin_h
+        arrow_y = screen_y - arrow_len * cos_h
         pg.draw.line(self.screen, (255, 255, 100), 
                     (screen_x, screen_y), (arrow_x, arrow_y), 3)
         
@@ -225,6 +359,18 @@ class SimulatorUI:
         pg.draw.circle(self.screen, (255, 255, 255), 
                       (int(screen_x), int(screen_y)), 3)
     
+    def _robot_sprite(self, length_px: float) -> Texture:
+        """Robot drawn heading up on a transparent square, for the GPU to rotate."""
+        size = int(math.ceil(length_px * 1.2)) + 6  # room for the arrow tip
+        c = size / 2
+        surf = pg.Surface((size, size), pg.SRCALPHA)
+        body = [(c + dx, c + dy) for dx, dy in self._robot_corners]
+        pg.draw.polygon(surf, (80, 120, 200), body)
+        pg.draw.polygon(surf, (120, 160, 240), body, 2)
+        pg.draw.line(surf, (255, 255, 100), (c, c), (c, c - length_px * 0.6), 3)
+        pg.draw.circle(surf, (255, 255, 255), (int(c), int(c)), 3)
+        return Texture.from_surface(self.renderer, surf)
+    
     def _draw_telemetry(self, state, x: int, y: int) -> None:
         """Draw telemetry information."""
         lines = [
@@ -248,44 +394,27 @@ class SimulatorUI:
             f"  Wheelbase: {self.config.wheelbase_cm:.2f} cm",
         ]
         
+        cache = self._telem_surfs
+        if len(cache) != len(lines):
+            cache[:] = [None] * len(lines)
         for i, line in enumerate(lines):
-            color = (220, 220, 220) if line.startswith("===") else (180, 180, 180)
-            text = self.font_small.render(line, True, color)
-            self.screen.blit(text, (x, y + i * 18))
+            entry = cache[i]
+            if entry is None or entry[0] != line:
+                color = (220, 220, 220) if line.startswith("===") else (180, 180, 180)
+                entry = cache[i] = (line, self._text(line, color))
+            self._blit(entry[1], x, y + i * 18)
     
     def _draw_help(self) -> None:
         """Draw help overlay."""
-        help_lines = [
-            "Controls:",
-            "  W/A/S/D - Manual drive",
-            "  Space - Stop motors",
-            "  R - Reset robot to origin",
-            "  H - Toggle this help",
-            "  T - Toggle telemetry",
-            "  Q/Esc - Quit",
-            "",
-            "The mock ESP32 is running:",
-            "  Control: port 9000",
-            "  Telemetry: port 9001 → 127.0.0.1",
-        ]
-        
-        padding = 12
-        line_height = 20
-        box_w = 320
-        box_h = len(help_lines) * line_height + padding * 2
-        box_x = self.win_w - box_w - 20
+        box_x = self.win_w - HELP_BOX_W - 20
         box_y = 20
         
         # Draw semi-transparent background
-        overlay = pg.Surface((box_w, box_h), pg.SRCALPHA)
-        overlay.fill((10, 10, 15, 200))
-        self.screen.blit(overlay, (box_x, box_y))
+        self._blit(self._help_overlay, box_x, box_y)
         
         # Draw text
-        for i, line in enumerate(help_lines):
-            color = (240, 240, 240) if line.endswith(":") else (200, 200, 200)
-            text = self.font_small.render(line, True, color)
-            self.screen.blit(text, (box_x + padding, box_y + padding + i * line_height))
+        for i, text in enumerate(self._help_surfs):
+            self._blit(text, box_x + HELP_PADDING, box_y + HELP_PADDING + i * HELP_LINE_HEIGHT)
     
     def cleanup(self) -> None:
         """Clean up resources."""
@@ -297,8 +426,13 @@ class SimulatorUI:
 
 def main():
     """Run the simulator."""
+    parser = argparse.ArgumentParser(description="Robot simulator UI")
+    parser.add_argument("--sw", action="store_true",
+                        help="Use the software renderer instead of the GPU (e.g. headless or remote)")
+    args = parser.parse_args()
+    
     try:
-        sim = SimulatorUI()
+        sim = SimulatorUI(software=args.sw)
         sim.run()
     except KeyboardInterrupt:
         print("\nInterrupted")
@@ -49,31 +49,20 @@ def test_ppd_calibration():
     ticks_per_360 = int(current_ppd * 360)
     print(f"Commanding 360° rotation ({ticks_per_360} ticks)...")
     
-    start_enc = advanced.get_latest_encoders()[0]
-    start_left = start_enc.get('m1', 0)
-    start_right = start_enc.get('m2', 0)
+    start_left, start_right = advanced.get_latest_encoder_pair()
     
     # Turn in place (left=-ticks, right=+ticks)
-    advanced.move_by_ticks(-ticks_per_360, ticks_per_360, -45, 45)
-    
-    # Wait for completion
-    timeout = time.time() + 10.0
-    while time.time() < timeout:
-        enc = advanced.get_latest_encoders()[0]
-        left_delta = abs(enc.get('m1', 0) - start_left)
-        right_delta = abs(enc.get('m2', 0) - start_right)
-        
-        if left_delta >= ticks_per_360 * 0.95 and right_delta >= ticks_per_360 * 0.95:
-            break
-        time.sleep(0.1)
+    done = advanced.move_by_ticks(-ticks_per_360, ticks_per_360, -45, 45)
+    
+    # Wait for the ESP32 to ack the finished move
+    if not advanced.wait_for_move(done, 10.0):
+        print("WARNING: move did not finish within 10 s")
     
     advanced.stop_motors()
     time.sleep(0.5)
     
     # Check final state
-    end_enc = advanced.get_latest_encoders()[0]
-    end_left = end_enc.get('m1', 0)
-    end_right = end_enc.get('m2', 0)
+    end_left, end_right = advanced.get_latest_encoder_pair()
     
     actual_left = abs(end_left - start_left)
     actual_right = abs(end_right - start_right)
@@ -134,32 +123,21 @@ def test_ppc_calibration():
     ticks = int(current_ppc * distance_cm)
     print(f"Commanding {distance_cm} cm forward ({ticks} ticks)...")
     
-    start_enc = advanced.get_latest_encoders()[0]
-    start_left = start_enc.get('m1', 0)
-    start_right = start_enc.get('m2', 0)
+    start_left, start_right = advanced.get_latest_encoder_pair()
     start_x, start_y, _ = robot.get_pose()
     
     # Move forward
-    advanced.move_by_ticks(ticks, ticks, 45, 45)
-    
-    # Wait for completion
-    timeout = time.time() + 10.0
-    while time.time() < timeout:
-        enc = advanced.get_latest_encoders()[0]
-        left_delta = abs(enc.get('m1', 0) - start_left)
-        right_delta = abs(enc.get('m2', 0) - start_right)
-        
-        if left_delta >= ticks * 0.95 and right_delta >= ticks * 0.95:
-            break
-        time.sleep(0.1)
+    done = advanced.move_by_ticks(ticks, ticks, 45, 45)
+    
+    # Wait for the ESP32 to ack the finished move
+    if not advanced.wait_for_move(done, 10.0):
+        print("WARNING: move did not finish within 10 s")
     
     advanced.stop_motors()
     time.sleep(0.5)
     
     # Check final state
-    end_enc = advanced.get_latest_encoders()[0]
-    end_left = end_enc.get('m1', 0)
-    end_right = end_enc.get('m2', 0)
+    end_left, end_right = advanced.get_latest_encoder_pair()
     
     actual_left = abs(end_left - start_left)
     actual_right = abs(end_right - start_right)
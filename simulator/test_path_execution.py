@@ -6,7 +6,6 @@ how the path following works without hardware.
 """
 from __future__ import annotations
 
-import csv
 import os
 import sys
 import time
@@ -21,12 +20,12 @@ from simulator.mock_esp32 import MockESP32
 # Import control using sim_advanced
 from simulator import sim_advanced as advanced
 from calibration_config import load_pulses_per_degree, load_pulses_per_cm
+from path_planner import read_path_csv
 
 
 def load_path(script_dir: str) -> list[tuple[float, float]]:
     """Load path from path.csv."""
     path_file = os.path.join(script_dir, "path.csv")
-    segments = []
     
     if not os.path.exists(path_file):
         print(f"Warning: {path_file} not found. Using demo path.")
@@ -38,14 +37,8 @@ def load_path(script_dir: str) -> list[tuple[float, float]]:
             (90, 50),   # turn 90°, forward 50cm
         ]
     
-    with open(path_file, newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            turn_deg = float(row.get("turn_deg", 0))
-            distance_cm = float(row.get("distance_cm", 0))
-            segments.append((turn_deg, distance_cm))
-    
-    return segments
+    # Parsed once, then served from the path.csv.bin cache until the CSV changes
+    return read_path_csv(path_file)
 
 
 def execute_path(robot: VirtualRobot, segments: list[tuple[float, float]]) -> None:
@@ -67,27 +60,25 @@ def execute_path(robot: VirtualRobot, segments: list[tuple[float, float]]) -> No
             
             if turn_deg > 0:
                 # Turn right (left=+, right=-)
-                advanced.move_by_ticks(turn_ticks, -turn_ticks, turn_speed, -turn_speed)
+                done = advanced.move_by_ticks(turn_ticks, -turn_ticks, turn_speed, -turn_speed)
             else:
                 # Turn left (left=-, right=+)
-                advanced.move_by_ticks(-turn_ticks, turn_ticks, -turn_speed, turn_speed)
+                done = advanced.move_by_ticks(-turn_ticks, turn_ticks, -turn_speed, turn_speed)
             
-            # Wait for turn completion
-            time.sleep(abs(turn_deg) / 90.0 * 1.5 + 0.5)
+            # Wait for turn completion; the timeout is only a safety net
+            advanced.wait_for_move(done, abs(turn_deg) / 90.0 * 3.0 + 2.0)
             advanced.stop_motors()
-            time.sleep(0.3)
         
         # Move forward
         if distance_cm > 0.5:
             move_ticks = int(ppc * distance_cm)
             move_speed = 45
             
-            advanced.move_by_ticks(move_ticks, move_ticks, move_speed, move_speed)
+            done = advanced.move_by_ticks(move_ticks, move_ticks, move_speed, move_speed)
             
             # Wait for move completion
-            time.sleep(distance_cm / 40.0 + 0.5)
+            advanced.wait_for_move(done, distance_cm / 20.0 + 2.0)
             advanced.stop_motors()
-            time.sleep(0.3)
         
         # Print current state
         x, y, heading = robot.get_pose()
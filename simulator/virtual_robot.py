@@ -7,11 +7,57 @@ and realistic physics. Used by mock_esp32.py to provide telemetry data.
 from __future__ import annotations
 
 import math
+import os
 import threading
 import time
 from dataclasses import dataclass
-from typing import Tuple
+from functools import cached_property
+from typing import Callable, Tuple
 
+_DEG2RAD = math.pi / 180.0
+
+# Source of the pure-Python physics tick. _specialize_physics fills in the
+# cached constants as float literals and binds the result to the instance as
+# _update_physics; with JIT the class method runs virtual_robot_jit instead.
+_PHYSICS_TEMPLATE = """
+def _update_physics(self, dt):
+    with self.lock:
+        s = self.state
+        if s.move_active:
+            if abs(s.left_encoder - s.move_start_left) >= abs(s.move_target_left) and \\
+               abs(s.right_encoder - s.move_start_right) >= abs(s.move_target_right):
+                # Target reached, stop motors
+                s.left_speed_pwm = 0
+                s.right_speed_pwm = 0
+                s.move_active = False
+                self._finish_move()
+        
+        # Convert PWM to wheel speeds (cm/s), motor factors included
+        left_speed_cm_s = s.left_speed_pwm * {pwm_to_cm_s_left!r}
+        right_speed_cm_s = s.right_speed_pwm * {pwm_to_cm_s_right!r}
+        
+        # Differential drive kinematics
+        forward_speed = (left_speed_cm_s + right_speed_cm_s) * 0.5
+        angular_speed_deg_s = (right_speed_cm_s - left_speed_cm_s) * {wb_inv_rad2deg!r}
+        
+        # Update pose (-Y is up)
+        heading_rad = s.heading_deg * {deg2rad!r}
+        s.x_cm += forward_speed * sin(heading_rad) * dt
+        s.y_cm -= forward_speed * cos(heading_rad) * dt
+        s.heading_deg = (s.heading_deg + angular_speed_deg_s * dt) % 360.0
+        
+        # Update encoders based on wheel distances, keeping the sub-pulse
+        # remainder (int() truncates toward zero, so it works both ways)
+        left_accum = self._left_accum + left_speed_cm_s * dt * {ppc!r}
+        right_accum = self._right_accum + right_speed_cm_s * dt * {ppc!r}
+        left_pulses = int(left_accum)
+        right_pulses = int(right_accum)
+        self._left_accum = left_accum - left_pulses
+        self._right_accum = right_accum - right_pulses
+        s.left_encoder += left_pulses
+        s.right_encoder += right_pulses
+        self._publish()
+"""
 
 @dataclass
 class RobotConfig:
@@ -23,16 +69,25 @@ class RobotConfig:
     motor_factor_right: float = 1.0
     max_speed: int = 100  # maximum PWM value
     
-    @property
+    # Derived values below are computed once and cached in the instance dict
+    _DERIVED = ("wheel_circumference_cm", "pulses_per_cm", "pulses_per_degree")
+    
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Changing a field invalidates the cached derived values
+        for key in self._DERIVED:
+            self.__dict__.pop(key, None)
+    
+    @cached_property
     def wheel_circumference_cm(self) -> float:
         return math.pi * self.wheel_diameter_cm
     
-    @property
+    @cached_property
     def pulses_per_cm(self) -> float:
         """Encoder pulses per cm of wheel travel."""
         return self.ppr / self.wheel_circumference_cm
     
-    @property
+    @cached_property
     def pulses_per_degree(self) -> float:
         """Encoder pulses per degree of rotation."""
         # For differential drive: rotation creates arc length difference
@@ -67,10 +122,19 @@ class RobotState:
 class VirtualRobot:
     """Simulates differential drive robot with encoder feedback."""
     
-    def __init__(self, config: RobotConfig | None = None):
+    def __init__(self, config: RobotConfig | None = None, use_jit: bool = False):
         self.config = config or RobotConfig()
         self.state = RobotState()
+        # Serializes writers (physics and commands). Readers never take it: they
+        # read _front, an immutable snapshot re-published after every write.
         self.lock = threading.Lock()
+        self._move_done: Callable[[], None] | None = None
+        self._publish()
+        
+        # Fractional encoder pulses carried between ticks, so slow wheels
+        # aren't truncated to zero every step
+        self._left_accum = 0.0
+        self._right_accum = 0.0
         
         # Physics simulation
         self.dt = 0.02  # 50 Hz update rate
@@ -79,11 +143,28 @@ class VirtualRobot:
         
         # Simulation parameters
         self.speed_to_cm_per_sec = 0.5  # PWM 100 = 50 cm/s (adjustable)
+        self._jit = None
+        self._recompute_derived()
+        
+        # Compiled physics kernel (virtual_robot_jit), used only if numba is installed
+        if use_jit:
+            try:
+                from simulator import virtual_robot_jit as jit
+            except ImportError:  # running from inside simulator/
+                import virtual_robot_jit as jit
+            if jit.step_physics is not None:
+                import numpy as np
+                self._jit = jit
+                self._jit_state = np.zeros(jit.STATE_SIZE)
+                self._jit_cfg = np.zeros(jit.CFG_SIZE)
+                self._recompute_derived()
+        self.use_jit = self._jit is not None
     
     def start(self) -> None:
         """Start physics simulation thread."""
         if self.running:
             return
+        self._recompute_derived()
         self.running = True
         self.physics_thread = threading.Thread(target=self._physics_loop, daemon=True)
         self.physics_thread.start()
@@ -97,30 +178,52 @@ class VirtualRobot:
     
     def reset(self, x: float = 0.0, y: float = 0.0, heading: float = 0.0) -> None:
         """Reset robot to given pose."""
+        self._recompute_derived()
         with self.lock:
             self.state.x_cm = x
             self.state.y_cm = y
             self.state.heading_deg = heading
             self.state.left_encoder = 0
             self.state.right_encoder = 0
+            self._left_accum = 0.0
+            self._right_accum = 0.0
             self.state.left_speed_pwm = 0
             self.state.right_speed_pwm = 0
             self.state.move_active = False
+            self._finish_move()
+            self._publish()
     
     def set_motor_pwm(self, left_pwm: int, right_pwm: int) -> None:
         """Set motor PWM values (direct control)."""
+        # Clamp with comparisons; cheaper than max(min()) calls on this hot path
+        max_speed = self.config.max_speed
+        if left_pwm > max_speed:
+            left_pwm = max_speed
+        elif left_pwm < -max_speed:
+            left_pwm = -max_speed
+        if right_pwm > max_speed:
+            right_pwm = max_speed
+        elif right_pwm < -max_speed:
+            right_pwm = -max_speed
         with self.lock:
-            self.state.left_speed_pwm = max(-self.config.max_speed, 
-                                            min(self.config.max_speed, left_pwm))
-            self.state.right_speed_pwm = max(-self.config.max_speed, 
-                                             min(self.config.max_speed, right_pwm))
+            self.state.left_speed_pwm = left_pwm
+            self.state.right_speed_pwm = right_pwm
             # Cancel move-by-ticks if active
             self.state.move_active = False
+            self._finish_move()
+            self._publish()
     
     def move_by_ticks(self, left_ticks: int, right_ticks: int, 
-                      left_speed: int, right_speed: int) -> None:
-        """Command robot to move until encoder targets are reached."""
+                      left_speed: int, right_speed: int,
+                      on_done: Callable[[], None] | None = None) -> None:
+        """Command robot to move until encoder targets are reached.
+        
+        on_done is called (from the physics thread, with the lock held) once
+        the move ends: targets reached, or cancelled by another command.
+        """
         with self.lock:
+            self._finish_move()  # a new move supersedes any running one
+            self._move_done = on_done
             self.state.move_active = True
             self.state.move_target_left = left_ticks
             self.state.move_target_right = right_ticks
@@ -131,89 +234,152 @@ class VirtualRobot:
             # Set initial motor speeds
             self.state.left_speed_pwm = left_speed
             self.state.right_speed_pwm = right_speed
+            self._publish()
+    
+    def _finish_move(self) -> None:
+        """Fire the pending move-done callback, if any. Caller holds the lock."""
+        callback, self._move_done = self._move_done, None
+        if callback is not None:
+            callback()
+    
+    def _publish(self) -> None:
+        """Publish a snapshot of self.state for lock-free readers (call with lock held).
+        
+        Rebinding _front is atomic, so a reader always sees one whole snapshot.
+        """
+        s = self.state
+        self._front = (s.x_cm, s.y_cm, s.heading_deg, s.left_encoder, s.right_encoder,
+                       s.left_speed_pwm, s.right_speed_pwm, s.move_active)
     
     def get_state(self) -> RobotState:
         """Get current robot state (thread-safe copy)."""
-        with self.lock:
-            return RobotState(
-                x_cm=self.state.x_cm,
-                y_cm=self.state.y_cm,
-                heading_deg=self.state.heading_deg,
-                left_encoder=self.state.left_encoder,
-                right_encoder=self.state.right_encoder,
-                left_speed_pwm=self.state.left_speed_pwm,
-                right_speed_pwm=self.state.right_speed_pwm,
-                move_active=self.state.move_active,
-            )
+        x, y, heading, left_enc, right_enc, left_pwm, right_pwm, move_active = self._front
+        return RobotState(
+            x_cm=x,
+            y_cm=y,
+            heading_deg=heading,
+            left_encoder=left_enc,
+            right_encoder=right_enc,
+            left_speed_pwm=left_pwm,
+            right_speed_pwm=right_pwm,
+            move_active=move_active,
+        )
     
     def get_encoders(self) -> Tuple[int, int]:
         """Get current encoder counts."""
-        with self.lock:
-            return self.state.left_encoder, self.state.right_encoder
+        return self._front[3:5]
     
     def get_pose(self) -> Tuple[float, float, float]:
         """Get current pose (x, y, heading)."""
-        with self.lock:
-            return self.state.x_cm, self.state.y_cm, self.state.heading_deg
+        return self._front[:3]
+    
+    def _recompute_derived(self) -> None:
+        """Cache the per-tick constants derived from config and speed_to_cm_per_sec.
+        
+        Called from __init__, start() and reset(); call it again after changing
+        config or speed_to_cm_per_sec on a running robot.
+        """
+        cfg = self.config
+        # PWM -> wheel speed (cm/s), motor factor included
+        self._pwm_to_cm_s_left = cfg.motor_factor_left * self.speed_to_cm_per_sec
+        self._pwm_to_cm_s_right = cfg.motor_factor_right * self.speed_to_cm_per_sec
+        # Wheel speed difference (cm/s) -> turn rate (deg/s)
+        self._wb_inv_rad2deg = 180.0 / (math.pi * cfg.wheelbase_cm)
+        self._ppc = cfg.pulses_per_cm
+        if self._jit is not None:
+            self._jit_cfg[:] = (self._pwm_to_cm_s_left, self._pwm_to_cm_s_right,
+                                self._wb_inv_rad2deg, self._ppc)
+            self.__dict__.pop("_update_physics", None)
+        else:
+            self._update_physics = self._specialize_physics()
+    
+    def _specialize_physics(self):
+        """Compile _update_physics with the current constants folded in.
+        
+        The cached constants become float literals in generated source (float()
+        first, so numpy scalars in RobotConfig still render as plain numbers),
+        and each tick skips their attribute lookups. The result is bound to this
+        instance in place of the JIT tick until the next _recompute_derived().
+        """
+        src = _PHYSICS_TEMPLATE.format(
+            pwm_to_cm_s_left=float(self._pwm_to_cm_s_left),
+            pwm_to_cm_s_right=float(self._pwm_to_cm_s_right),
+            wb_inv_rad2deg=float(self._wb_inv_rad2deg),
+            deg2rad=float(_DEG2RAD),
+            ppc=float(self._ppc),
+        )
+        ns = {"sin": math.sin, "cos": math.cos}
+        exec(compile(src, "<physics>", "exec"), ns)
+        return ns["_update_physics"].__get__(self)
     
     def _physics_loop(self) -> None:
-        """Physics simulation loop (runs in separate thread)."""
-        last_time = time.time()
+        """Physics simulation loop (runs in separate thread).
         
+        Steps at a fixed self.dt on absolute monotonic deadlines, sleeping
+        through the whole gap between ticks instead of polling.
+        """
+        period_ns = round(self.dt * 1e9)
+        if hasattr(os, "timerfd_create"):  # Linux, Python 3.13+
+            self._physics_loop_timerfd(period_ns)
+            return
+        
+        next_tick = time.monotonic_ns()
         while self.running:
-            current_time = time.time()
-            dt = current_time - last_time
-            
-            if dt >= self.dt:
-                self._update_physics(dt)
-                last_time = current_time
-            
-            time.sleep(0.001)  # Small sleep to prevent CPU spinning
+            next_tick += period_ns
+            delay_ns = next_tick - time.monotonic_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            elif delay_ns < -period_ns:
+                # Far behind (e.g. the process was paused); don't replay the backlog
+                next_tick = time.monotonic_ns()
+            self._update_physics(self.dt)
+    
+    def _physics_loop_timerfd(self, period_ns: int) -> None:
+        """Fixed-step loop driven by a kernel periodic timer."""
+        fd = os.timerfd_create(time.CLOCK_MONOTONIC)
+        try:
+            os.timerfd_settime_ns(fd, initial=period_ns, interval=period_ns)
+            while self.running:
+                os.read(fd, 8)  # blocks until the next expiry; missed ticks are skipped
+                self._update_physics(self.dt)
+        finally:
+            os.close(fd)
     
     def _update_physics(self, dt: float) -> None:
-        """Update robot physics for one timestep."""
+        """Update robot physics for one timestep with the compiled kernel.
+        
+        Only used with JIT; otherwise _recompute_derived() replaces it with the
+        pure-Python tick generated from _PHYSICS_TEMPLATE.
+        """
         with self.lock:
+            s = self.state
             # Check move-by-ticks completion
-            if self.state.move_active:
-                left_delta = abs(self.state.left_encoder - self.state.move_start_left)
-                right_delta = abs(self.state.right_encoder - self.state.move_start_right)
+            if s.move_active:
+                left_delta = abs(s.left_encoder - s.move_start_left)
+                right_delta = abs(s.right_encoder - s.move_start_right)
                 
-                if left_delta >= abs(self.state.move_target_left) and \
-                   right_delta >= abs(self.state.move_target_right):
+                if left_delta >= abs(s.move_target_left) and \
+                   right_delta >= abs(s.move_target_right):
                     # Target reached, stop motors
-                    self.state.left_speed_pwm = 0
-                    self.state.right_speed_pwm = 0
-                    self.state.move_active = False
-            
-            # Apply motor factors
-            left_actual = self.state.left_speed_pwm * self.config.motor_factor_left
-            right_actual = self.state.right_speed_pwm * self.config.motor_factor_right
-            
-            # Convert PWM to wheel speeds (cm/s)
-            left_speed_cm_s = (left_actual / self.config.max_speed) * self.speed_to_cm_per_sec * self.config.max_speed
-            right_speed_cm_s = (right_actual / self.config.max_speed) * self.speed_to_cm_per_sec * self.config.max_speed
-            
-            # Differential drive kinematics
-            forward_speed = (left_speed_cm_s + right_speed_cm_s) / 2.0
-            angular_speed_deg_s = (right_speed_cm_s - left_speed_cm_s) / self.config.wheelbase_cm * 180.0 / math.pi
+                    s.left_speed_pwm = 0
+                    s.right_speed_pwm = 0
+                    s.move_active = False
+                    self._finish_move()
             
-            # Update pose
-            heading_rad = math.radians(self.state.heading_deg)
-            self.state.x_cm += forward_speed * math.sin(heading_rad) * dt
-            self.state.y_cm -= forward_speed * math.cos(heading_rad) * dt  # -Y is up
-            self.state.heading_deg += angular_speed_deg_s * dt
-            self.state.heading_deg = self.state.heading_deg % 360.0
-            
-            # Update encoders based on wheel distances
-            left_dist_cm = left_speed_cm_s * dt
-            right_dist_cm = right_speed_cm_s * dt
-            
-            left_pulses = int(left_dist_cm * self.config.pulses_per_cm)
-            right_pulses = int(right_dist_cm * self.config.pulses_per_cm)
-            
-            self.state.left_encoder += left_pulses
-            self.state.right_encoder += right_pulses
-
+            jit, st = self._jit, self._jit_state
+            st[jit.X] = s.x_cm
+            st[jit.Y] = s.y_cm
+            st[jit.HEADING] = s.heading_deg
+            st[jit.ACCUM_L] = self._left_accum
+            st[jit.ACCUM_R] = self._right_accum
+            st[jit.PWM_L] = s.left_speed_pwm
+            st[jit.PWM_R] = s.right_speed_pwm
+            jit.step_physics(st, self._jit_cfg, dt)
+            s.x_cm, s.y_cm, s.heading_deg, self._left_accum, self._right_accum = \
+                st[:jit.PWM_L].tolist()
+            s.left_encoder += int(st[jit.PULSES_L])
+            s.right_encoder += int(st[jit.PULSES_R])
+            self._publish()
 
 def main():
     """Test virtual robot."""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Optional Numba-compiled physics kernel for VirtualRobot.
+
+Importing this module never fails: without numba installed, ``step_physics``
+is None and VirtualRobot keeps using its pure-Python update.
+"""
+from __future__ import annotations
+
+import math
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+_DEG2RAD = math.pi / 180.0
+
+# Layout of the float64 state vector passed to step_physics
+X, Y, HEADING, ACCUM_L, ACCUM_R, PWM_L, PWM_R, PULSES_L, PULSES_R = range(9)
+STATE_SIZE = 9
+
+# Layout of the float64 config vector (constants from _recompute_derived)
+PWM_TO_CM_S_L, PWM_TO_CM_S_R, WB_INV_RAD2DEG, PULSES_PER_CM = range(4)
+CFG_SIZE = 4
+
+
+def _step_physics(state, cfg, dt):
+    """Advance one differential-drive timestep in place.
+
+    Reads pose, PWM and the fractional pulse accumulators from ``state`` and
+    writes back the new pose, accumulators and the whole encoder pulses for
+    this tick (PULSES_L/PULSES_R). Same arithmetic as
+    the pure-Python tick in virtual_robot._PHYSICS_TEMPLATE, so both paths
+    agree exactly.
+    """
+    # Convert PWM to wheel speeds (cm/s), motor factors included
+    left_speed_cm_s = state[PWM_L] * cfg[PWM_TO_CM_S_L]
+    right_speed_cm_s = state[PWM_R] * cfg[PWM_TO_CM_S_R]
+
+    # Differential drive kinematics
+    forward_speed = (left_speed_cm_s + right_speed_cm_s) * 0.5
+    angular_speed_deg_s = (right_speed_cm_s - left_speed_cm_s) * cfg[WB_INV_RAD2DEG]
+
+    # Update pose
+    heading_rad = state[HEADING] * _DEG2RAD
+    state[X] += forward_speed * math.sin(heading_rad) * dt
+    state[Y] -= forward_speed * math.cos(heading_rad) * dt  # -Y is up
+    state[HEADING] = (state[HEADING] + angular_speed_deg_s * dt) % 360.0
+
+    # Encoder pulses for the wheel distances travelled, keeping the remainder
+    left_accum = state[ACCUM_L] + left_speed_cm_s * dt * cfg[PULSES_PER_CM]
+    right_accum = state[ACCUM_R] + right_speed_cm_s * dt * cfg[PULSES_PER_CM]
+    left_pulses = float(int(left_accum))
+    right_pulses = float(int(right_accum))
+    state[ACCUM_L] = left_accum - left_pulses
+    state[ACCUM_R] = right_accum - right_pulses
+    state[PULSES_L] = left_pulses
+    state[PULSES_R] = right_pulses
+
+
+# nogil lets several simulated robots run their kernels in parallel threads.
+# No fastmath: it may reorder the float ops and drift from the Python path.
+step_physics = (njit(cache=True, nogil=True)(_step_physics)
+                if njit is not None else None)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Vectorized physics for many virtual robots at once.
+
+VirtualRobotSwarm keeps the state of N robots as NumPy arrays (one array per
+field) and advances all of them with a single set of array operations per
+step. It uses the same kinematics as VirtualRobot's physics tick but has no
+thread, lock, or mock ESP32 per robot, which makes it suited to batch runs
+such as calibration sweeps. Requires numpy.
+"""
+from __future__ import annotations
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from simulator.virtual_robot import RobotConfig
+except ImportError:  # running from inside simulator/
+    from virtual_robot import RobotConfig
+
+_DEG2RAD = math.pi / 180.0
+
+
+class VirtualRobotSwarm:
+    """N differential-drive robots stepped together as structure-of-arrays."""
+
+    def __init__(self, n: int, config: RobotConfig | None = None,
+                 motor_factor_left: np.ndarray | float | None = None,
+                 motor_factor_right: np.ndarray | float | None = None):
+        self.config = config or RobotConfig()
+        self.n = n
+        self.dt = 0.02  # default step, same as VirtualRobot
+        self.speed_to_cm_per_sec = 0.5  # PWM 100 = 50 cm/s (adjustable)
+
+        # Per-robot motor factors; scalars or (n,) arrays, e.g. randomized imbalance
+        cfg = self.config
+        self.motor_factor_l = np.broadcast_to(
+            cfg.motor_factor_left if motor_factor_left is None else motor_factor_left,
+            (n,)).astype(np.float64)
+        self.motor_factor_r = np.broadcast_to(
+            cfg.motor_factor_right if motor_factor_right is None else motor_factor_right,
+            (n,)).astype(np.float64)
+
+        # Pose and encoders
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.h = np.zeros(n)  # heading in degrees, 0 = up (north)
+        self.enc_l = np.zeros(n, dtype=np.int64)
+        self.enc_r = np.zeros(n, dtype=np.int64)
+        self._accum_l = np.zeros(n)  # fractional pulses carried between steps
+        self._accum_r = np.zeros(n)
+
+        # Motor commands and move-by-ticks state
+        self.pwm_l = np.zeros(n, dtype=np.int64)
+        self.pwm_r = np.zeros(n, dtype=np.int64)
+        self.move_active = np.zeros(n, dtype=bool)
+        self.move_target_l = np.zeros(n, dtype=np.int64)  # absolute tick counts
+        self.move_target_r = np.zeros(n, dtype=np.int64)
+        self.move_start_l = np.zeros(n, dtype=np.int64)
+        self.move_start_r = np.zeros(n, dtype=np.int64)
+
+        self._recompute_derived()
+
+    def _recompute_derived(self) -> None:
+        """Cache per-step constants; call again after changing factors or config."""
+        self._pwm_to_cm_s_l = self.motor_factor_l * self.speed_to_cm_per_sec
+        self._pwm_to_cm_s_r = self.motor_factor_r * self.speed_to_cm_per_sec
+        self._wb_inv_rad2deg = 180.0 / (math.pi * self.config.wheelbase_cm)
+        self._ppc = self.config.pulses_per_cm
+
+    def set_motor_pwm(self, idx, left_pwm, right_pwm) -> None:
+        """Set motor PWM for the robots selected by idx (index, slice or mask)."""
+        max_speed = self.config.max_speed
+        self.pwm_l[idx] = np.clip(left_pwm, -max_speed, max_speed)
+        self.pwm_r[idx] = np.clip(right_pwm, -max_speed, max_speed)
+        # Cancel move-by-ticks if active
+        self.move_active[idx] = False
+
+    def move_by_ticks(self, idx, left_ticks, right_ticks, left_speed, right_speed) -> None:
+        """Command the selected robots to move until their encoder targets are reached."""
+        self.move_active[idx] = True
+        self.move_target_l[idx] = np.abs(left_ticks)
+        self.move_target_r[idx] = np.abs(right_ticks)
+        self.move_start_l[idx] = self.enc_l[idx]
+        self.move_start_r[idx] = self.enc_r[idx]
+        self.pwm_l[idx] = left_speed
+        self.pwm_r[idx] = right_speed
+
+    def step(self, dt: float | None = None) -> None:
+        """Advance every robot by one timestep."""
+        if dt is None:
+            dt = self.dt
+
+        # Stop robots whose move-by-ticks target has been reached
+        done = (self.move_active
+                & (np.abs(self.enc_l - self.move_start_l) >= self.move_target_l)
+                & (np.abs(self.enc_r - self.move_start_r) >= self.move_target_r))
+        if done.any():
+            self.pwm_l[done] = 0
+            self.pwm_r[done] = 0
+            self.move_active[done] = False
+
+        # Wheel speeds (cm/s) and differential drive kinematics
+        lcs = self.pwm_l * self._pwm_to_cm_s_l
+        rcs = self.pwm_r * self._pwm_to_cm_s_r
+        fwd = (lcs + rcs) * 0.5
+        omega = (rcs - lcs) * self._wb_inv_rad2deg
+
+        # Update pose
+        hr = self.h * _DEG2RAD
+        self.x += fwd * np.sin(hr) * dt
+        self.y -= fwd * np.cos(hr) * dt  # -Y is up
+        self.h += omega * dt
+        np.mod(self.h, 360.0, out=self.h)
+
+        # Encoder pulses, keeping the sub-pulse remainder (trunc matches int())
+        self._accum_l += lcs * dt * self._ppc
+        self._accum_r += rcs * dt * self._ppc
+        pulses_l = np.trunc(self._accum_l)
+        pulses_r = np.trunc(self._accum_r)
+        self._accum_l -= pulses_l
+        self._accum_r -= pulses_r
+        self.enc_l += pulses_l.astype(np.int64)
+        self.enc_r += pulses_r.astype(np.int64)
+
+    def get_pose(self, i: int) -> Tuple[float, float, float]:
+        """Get pose (x, y, heading) of robot i."""
+        return float(self.x[i]), float(self.y[i]), float(self.h[i])
+
+    def get_encoders(self, i: int) -> Tuple[int, int]:
+        """Get encoder counts of robot i."""
+        return int(self.enc_l[i]), int(self.enc_r[i])
@@ -7,9 +7,14 @@ balance factors until the operator confirms the robot travels straight,
 then persists the updated factors to ``robot_calibration.json`` so all
 other tools (including ``advanced.py`` and ``move_control.py``) pick up
 the change automatically.
+
+With ``--auto`` the drift is measured from the wheel encoders instead and the
+factors are corrected after every drive, usually converging in a few runs
+without operator input. Interactive mode remains the fallback.
 """
 from __future__ import annotations
 
+import argparse
 import sys
 import time
 
@@ -21,17 +26,47 @@ TEST_DURATION_SECONDS = 3
 STEP_DEFAULT = 0.02
 MIN_FACTOR = 0.2
 MAX_FACTOR = 3.0
+SETTLE_TIMEOUT_SECONDS = 0.4
+AUTO_TOLERANCE = 0.01  # accept |right/left - 1| below this
+AUTO_MAX_RUNS = 8
+AUTO_MIN_TICKS = 50  # less than this means the encoders aren't reporting
+
+
+def read_encoders() -> tuple[int, int]:
+    return advanced.get_latest_encoder_pair()
+
+
+def wait_until_stopped(timeout: float) -> tuple[int, int]:
+    """Wait for two identical encoder packets in a row (or timeout); return the counts."""
+    deadline = time.monotonic() + timeout
+    last = read_encoders()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return last
+        advanced.encoder_event.clear()
+        if not advanced.encoder_event.wait(remaining):
+            return last
+        counts = read_encoders()
+        if counts == last:
+            return counts
+        last = counts
 
 
-def drive_forward(duration: float, speed: int, left_factor: float, right_factor: float) -> None:
-    """Drive both motors forward for the requested duration and stop."""
+def drive_forward(duration: float, speed: int, left_factor: float, right_factor: float) -> tuple[int, int]:
+    """Drive both motors forward for the requested duration and stop.
+
+    Returns the (left, right) encoder ticks travelled.
+    """
     speed = max(5, min(120, int(speed)))
     print(f"\nDriving forward for {duration:.1f}s at speed {speed}...")
     print(f"  (Using motor factors: L={left_factor:.3f}, R={right_factor:.3f})")
+    start_left, start_right = read_encoders()
     advanced.send_motor(speed, speed)
     time.sleep(duration)
     advanced.stop_motors()
-    time.sleep(0.4)
+    end_left, end_right = wait_until_stopped(SETTLE_TIMEOUT_SECONDS)
+    return abs(end_left - start_left), abs(end_right - start_right)
 
 
 def clamp_factor(value: float) -> float:
@@ -77,9 +112,58 @@ def show_status(left: float, right: float, step: float, speed: int) -> None:
     print(f"Adjustment step: {step:.3f} | Test speed: {speed}")
 
 
-def calibrate() -> int:
+def auto_calibrate(left_factor: float, right_factor: float, speed: int) -> tuple[float, float] | None:
+    """Balance the motor factors from encoder drift; None if it can't converge.
+
+    After each drive the factors are scaled by sqrt(right/left) and its inverse,
+    which equalizes the wheels while keeping the average speed. The step is an
+    exponent on that correction: if a run gets worse, the step is halved and
+    applied to the best run's factors and ratio, so no run repeats old factors.
+    The operator puts the robot back at the start line before every run.
+    """
+    rate = 1.0
+    best_error = float("inf")
+    best = (left_factor, right_factor)
+    best_ratio = 1.0
+
+    for run in range(1, AUTO_MAX_RUNS + 1):
+        input(f"\nRun {run}/{AUTO_MAX_RUNS}: place the robot at the start line, "
+              "then press Enter (Ctrl+C to abort)...")
+        advanced.set_motor_factors(left_factor, right_factor)
+        d_left, d_right = drive_forward(TEST_DURATION_SECONDS, speed, left_factor, right_factor)
+        if min(d_left, d_right) < AUTO_MIN_TICKS:
+            print(f"Encoders moved only L={d_left}, R={d_right} ticks; cannot auto-calibrate.")
+            return None
+
+        ratio = d_right / d_left
+        error = abs(ratio - 1.0)
+        print(f"Run {run}: ticks L={d_left}, R={d_right}, ratio (R/L): {ratio:.4f}")
+        if error <= AUTO_TOLERANCE:
+            return left_factor, right_factor
+
+        if error > best_error:
+            # Overshot: correct from the best run again, with a smaller step
+            rate *= 0.5
+            left_factor, right_factor = best
+            ratio = best_ratio
+            print(f"Drift got worse; backing off (step {rate:.3f}).")
+        else:
+            best_error = error
+            best = (left_factor, right_factor)
+            best_ratio = ratio
+
+        correction = ratio ** (0.5 * rate)
+        left_factor = clamp_factor(left_factor * correction)
+        right_factor = clamp_factor(right_factor / correction)
+
+    print(f"No convergence within {AUTO_MAX_RUNS} runs.")
+    return None
+
+
+def calibrate(auto: bool = False) -> int:
     print("=== Straight-Line Compensation Calibrator ===")
     print("Place the robot on a long, obstruction-free straight line.")
+    print("Each test drives about 3 s forward; put the robot back before the next one.")
     print("The tool will drive forward; report whether it veered left or right.")
     print("Commands: Enter=run test, 'l'/'left', 'r'/'right', 's'/'straight',")
     print("          'step <value>' to change increment, 'speed <value>' to change test speed,")
@@ -99,6 +183,21 @@ def calibrate() -> int:
     show_status(left_factor, right_factor, step, test_speed)
 
     try:
+        if auto:
+            if advanced.wait_for_encoder_data(timeout=5.0):
+                result = auto_calibrate(left_factor, right_factor, test_speed)
+                if result is not None:
+                    left_factor, right_factor = result
+                    save_motor_factors(left_factor, right_factor)
+                    advanced.set_motor_factors(left_factor, right_factor)
+                    show_status(left_factor, right_factor, step, test_speed)
+                    print("Calibration saved. The robot should now track straighter.")
+                    return 0
+            else:
+                print("No encoder telemetry received.")
+            print("Falling back to interactive calibration.")
+            advanced.set_motor_factors(left_factor, right_factor)
+
         while True:
             command = input("\nPress Enter to run the straight test (or type a command): ").strip().lower()
 
@@ -172,4 +271,7 @@ def calibrate() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(calibrate())
+    parser = argparse.ArgumentParser(description="Straight-line motor balance calibration")
+    parser.add_argument("--auto", action="store_true",
+                        help="balance the motors from encoder drift instead of operator input")
+    sys.exit(calibrate(auto=parser.parse_args().auto))
@@ -3,132 +3,376 @@
 ESP32 Access Point Mode Test
 This script tests communication with ESP32 when it's running as a WiFi hotspot
 """
+import ctypes
+import errno
+import os
+import re
+import selectors
 import socket
+import struct
 import time
 import json
 import subprocess
 import sys
 
+from collections import deque
+
+from quick_esp32_check import probe_esp32
+
+try:
+    import orjson as _json  # parses bytes directly, much faster than stdlib json
+except ImportError:
+    _json = json
+
 # ESP32 AP Configuration (must match config.h)
 ESP32_AP_SSID = "ESP32-FruitBot"
 ESP32_AP_PASSWORD = "fruitbot123"
 ESP32_AP_IP = "192.168.4.1"  # ESP32's IP in AP mode
 CTRL_PORT = 9000
 TELEM_PORT = 9001
+# Telemetry receive buffer; large enough to absorb bursts while we print/parse
+RCVBUF_BYTES = 4 << 20
+# Most recent messages kept while listening; printed afterwards
+LOG_MESSAGES = 256
+# Profile line in `netsh wlan show profile` ("    All User Profile     : <name>")
+# whose name is exactly our SSID; one precompiled pass over the output
+_NETSH_PROFILE_RE = re.compile(r':\s*' + re.escape(ESP32_AP_SSID) + r'\s*$', re.MULTILINE)
+# Linux values the socket module doesn't name
+SO_BINDTODEVICE = getattr(socket, 'SO_BINDTODEVICE', 25)
+SIOCGIFADDR = 0x8915
+# Datagrams pulled per recvmmsg() call, and the slot size for each one
+BATCH_SIZE = 32
+BATCH_SLOT_BYTES = 2048
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),  # network byte order
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+
+def _load_recvmmsg():
+    """Return libc's recvmmsg() on Linux, or None where it is unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                   ctypes.c_int, ctypes.c_void_p]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_recvmmsg = _load_recvmmsg()
+
+
+def ap_interface_address():
+    """Return our IPv4 address on the ESP32's AP network, or None if not on it."""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect((ESP32_AP_IP, CTRL_PORT))  # only picks a route; nothing is sent
+        local_ip = probe.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        probe.close()
+    # The AP hands out addresses in its own /24
+    if local_ip.rsplit('.', 1)[0] != ESP32_AP_IP.rsplit('.', 1)[0]:
+        return None
+    return local_ip
+
+def interface_name_for(ip):
+    """Return the Linux interface name that owns ip, or None."""
+    import fcntl
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            try:
+                ifreq = fcntl.ioctl(probe.fileno(), SIOCGIFADDR,
+                                    struct.pack('256s', name.encode()[:15]))
+            except OSError:  # interface has no IPv4 address
+                continue
+            if socket.inet_ntoa(ifreq[20:24]) == ip:
+                return name
+    finally:
+        probe.close()
+    return None
+
+def bind_telemetry_socket(sock):
+    """Bind sock to TELEM_PORT, receiving only from the AP interface where possible.
+
+    A wildcard bind wakes the socket for port-9001 traffic on every interface
+    (LAN, VPN). The ESP32 broadcasts telemetry to 192.168.4.255 as well as
+    unicasting it, so the socket must still see that broadcast: Windows
+    delivers it to a socket bound to the interface address, while Linux only
+    delivers it to wildcard binds, so there we pin the device instead.
+    """
+    local_ip = ap_interface_address()
+    if local_ip is not None and sys.platform == 'win32':
+        sock.bind((local_ip, TELEM_PORT))
+        print(f"Telemetry socket bound to AP interface {local_ip}")
+        return
+    if local_ip is not None and sys.platform.startswith('linux'):
+        ifname = interface_name_for(local_ip)
+        if ifname is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE, ifname.encode() + b'\0')
+                print(f"Telemetry socket bound to AP interface {ifname}")
+            except OSError as e:  # older kernels require CAP_NET_RAW
+                print(f"⚠️ Could not bind to {ifname}, listening on all interfaces: {e}")
+    sock.bind(('', TELEM_PORT))
+
+def make_batch_receiver(sock):
+    """Return a function that drains sock in batches of (data, addr) pairs.
+
+    Each call returns whatever is queued (an empty list once the socket is
+    empty) without blocking. On Linux one recvmmsg() call fetches up to
+    BATCH_SIZE datagrams into preallocated slots; elsewhere it falls back to
+    one recvfrom_into() per call. sock must be a non-blocking AF_INET socket.
+    """
+    if _recvmmsg is None:
+        buf = bytearray(BATCH_SLOT_BYTES)
+        mv = memoryview(buf)
+
+        def recv_one():
+            try:
+                n, addr = sock.recvfrom_into(buf)
+            except BlockingIOError:
+                return []
+            return [(bytes(mv[:n]), addr)]
+        return recv_one
+
+    fd = sock.fileno()
+    slots = (ctypes.c_char * BATCH_SLOT_BYTES * BATCH_SIZE)()
+    names = (_SockAddrIn * BATCH_SIZE)()
+    iovs = (_IOVec * BATCH_SIZE)()
+    msgs = (_MMsgHdr * BATCH_SIZE)()
+    for i in range(BATCH_SIZE):
+        iovs[i].iov_base = ctypes.addressof(slots[i])
+        iovs[i].iov_len = BATCH_SLOT_BYTES
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.addressof(names[i])
+        hdr.msg_iov = ctypes.pointer(iovs[i])
+        hdr.msg_iovlen = 1
+    namelen = ctypes.sizeof(_SockAddrIn)
+
+    def recv_batch():
+        for i in range(BATCH_SIZE):
+            msgs[i].msg_hdr.msg_namelen = namelen  # the kernel overwrites it
+        n = _recvmmsg(fd, msgs, BATCH_SIZE, socket.MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        batch = []
+        for i in range(n):
+            name = names[i]
+            addr = (socket.inet_ntoa(bytes(name.sin_addr)), socket.ntohs(name.sin_port))
+            batch.append((slots[i][:msgs[i].msg_len], addr))
+        return batch
+    return recv_batch
 
 def check_wifi_connection():
     """Check if we're connected to the ESP32's WiFi network"""
     print("=== Checking WiFi Connection ===")
     
     try:
-        # Check current WiFi connection on Windows
+        # The firmware acks any packet on its control port, so an answered
+        # UDP probe proves we're on its network without spawning ping
+        try:
+            answered = probe_esp32(ESP32_AP_IP, CTRL_PORT)
+        except OSError:  # e.g. ICMP port unreachable: something is there, but not the robot
+            answered = False
+        if answered:
+            print(f"✅ ESP32 answered at {ESP32_AP_IP}")
+            return True
+        print(f"❌ No reply from ESP32 at {ESP32_AP_IP}")
+        
+        # Only on failure: check saved profiles on Windows to say what to fix
         result = subprocess.run(['netsh', 'wlan', 'show', 'profile'], 
                               capture_output=True, text=True)
         
-        if ESP32_AP_SSID in result.stdout:
+        if _NETSH_PROFILE_RE.search(result.stdout):
             print(f"✅ WiFi profile for {ESP32_AP_SSID} exists")
+            print("Make sure you're connected to the ESP32's WiFi network")
         else:
             print(f"❌ WiFi profile for {ESP32_AP_SSID} not found")
             print(f"Please connect to WiFi network: {ESP32_AP_SSID}")
             print(f"Password: {ESP32_AP_PASSWORD}")
-            return False
-            
-        # Check if we can reach the ESP32
-        result = subprocess.run(['ping', ESP32_AP_IP, '-n', '2'], 
-                              capture_output=True, text=True)
-        if 'Reply from' in result.stdout:
-            print(f"✅ Can ping ESP32 at {ESP32_AP_IP}")
-            return True
-        else:
-            print(f"❌ Cannot ping ESP32 at {ESP32_AP_IP}")
-            print("Make sure you're connected to the ESP32's WiFi network")
-            return False
+        return False
             
     except Exception as e:
         print(f"Error checking WiFi: {e}")
         return False
 
+def _describe_alive(msg):
+    return f"🤖 ESP32 is alive! Mode: {msg.get('mode', 'unknown')}"
+
+def _describe_encoders(msg):
+    counts = msg.get('counts')
+    if counts:
+        m1, m2 = counts.get('m1', 0), counts.get('m2', 0)
+    else:
+        m1 = m2 = 0
+    return f"📊 Encoder data - M1: {m1}, M2: {m2}"
+
+# Extra log line per message type; one dict lookup instead of an if/elif chain
+_MESSAGE_DESCRIBERS = {
+    'alive': _describe_alive,
+    'encoders': _describe_encoders,
+}
+
+def print_message_log(log):
+    """Print (addr, msg, raw) entries; msg is None for non-JSON payloads."""
+    lines = []
+    for addr, msg, data in log:
+        if msg is None:
+            lines.append(f"✅ Received non-JSON from {addr}: {data}")
+            continue
+        lines.append(f"✅ Received from {addr}: {msg}")
+        describe = _MESSAGE_DESCRIBERS.get(msg.get('type'))
+        if describe is not None:
+            lines.append(describe(msg))
+    if lines:
+        print("\n".join(lines))
+
 def test_esp32_communication():
     """Test UDP communication with ESP32"""
     print("\n=== Testing ESP32 Communication ===")
     
+    # One socket for both tests: it receives telemetry, sends the command,
+    # and gets the command's ACK back among the telemetry
+    sock = None
+    sel = selectors.DefaultSelector()
+    
     # Test 1: Listen for messages
     print("Test 1: Listening for ESP32 messages...")
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('', TELEM_PORT))
-        sock.settimeout(5.0)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+        # The OS may cap (or, on Linux, double) the request; report what we got
+        print(f"Receive buffer: {sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes")
+        bind_telemetry_socket(sock)
+        sock.setblocking(False)
+        # Preallocated receive slots, reused for every batch
+        recv_batch = make_batch_receiver(sock)
         
         print(f"Listening on port {TELEM_PORT} for 5 seconds...")
         
         messages_received = 0
-        start_time = time.time()
+        # Printing to a console can block long enough to overflow the socket
+        # buffer, so the latest messages are kept here and printed (and only
+        # then formatted) after listening
+        log = deque(maxlen=LOG_MESSAGES)
+        # Wait on readiness against a fixed deadline instead of timing out recvfrom
+        sel.register(sock, selectors.EVENT_READ)
+        deadline = time.monotonic() + 5.0
         
-        while time.time() - start_time < 5.0:
-            try:
-                data, addr = sock.recvfrom(1024)
-                messages_received += 1
-                
-                try:
-                    msg = json.loads(data.decode())
-                    print(f"✅ Received from {addr}: {msg}")
-                    
-                    if msg.get('type') == 'alive':
-                        print(f"🤖 ESP32 is alive! Mode: {msg.get('mode', 'unknown')}")
-                    elif msg.get('type') == 'encoders':
-                        counts = msg.get('counts', {})
-                        print(f"📊 Encoder data - M1: {counts.get('m1', 0)}, M2: {counts.get('m2', 0)}")
-                        
-                except json.JSONDecodeError:
-                    print(f"✅ Received non-JSON from {addr}: {data}")
-                    
-            except socket.timeout:
-                continue
-                
-        sock.close()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not sel.select(remaining):
+                break
+            # Drain everything already queued before waiting again
+            while True:
+                batch = recv_batch()
+                if not batch:
+                    break
+                messages_received += len(batch)
+                for data, addr in batch:
+                    try:
+                        log.append((addr, _json.loads(data), data))
+                    except _json.JSONDecodeError:
+                        log.append((addr, None, data))
+        
+        if messages_received > len(log):
+            print(f"... {messages_received - len(log)} earlier message(s) not shown")
+        print_message_log(log)
         
         if messages_received > 0:
             print(f"✅ Received {messages_received} message(s) - ESP32 is working!")
         else:
             print("❌ No messages received")
             return False
-            
-    except Exception as e:
-        print(f"❌ Error in Test 1: {e}")
-        return False
-    
-    # Test 2: Send command to ESP32
-    print("\nTest 2: Sending motor command...")
-    try:
-        ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        ctrl_sock.settimeout(3.0)
-        
-        test_cmd = {
-            'type': 'motor',
-            'left': 0,
-            'right': 0,
-            'seq': 42,
-            'ts': int(time.time() * 1000)
-        }
-        
-        ctrl_sock.sendto(json.dumps(test_cmd).encode(), (ESP32_AP_IP, CTRL_PORT))
-        print(f"✅ Sent command to {ESP32_AP_IP}:{CTRL_PORT}")
         
-        # Try to receive acknowledgment
+        # Test 2: Send command to ESP32
+        print("\nTest 2: Sending motor command...")
         try:
-            ack_data, ack_addr = ctrl_sock.recvfrom(1024)
-            ack = json.loads(ack_data.decode())
-            print(f"✅ Received ACK: {ack}")
-        except socket.timeout:
-            print("⚠️ No ACK received (but command sent)")
+            test_cmd = {
+                'type': 'motor',
+                'left': 0,
+                'right': 0,
+                'seq': 42,
+                'ts': int(time.time() * 1000)
+            }
+            
+            sock.sendto(json.dumps(test_cmd).encode(), (ESP32_AP_IP, CTRL_PORT))
+            print(f"✅ Sent command to {ESP32_AP_IP}:{CTRL_PORT}")
+            
+            # Try to receive acknowledgment, skipping telemetry
+            ack = None
+            deadline = time.monotonic() + 3.0
+            while ack is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not sel.select(remaining):
+                    break
+                while ack is None:
+                    batch = recv_batch()
+                    if not batch:
+                        break
+                    for data, addr in batch:
+                        try:
+                            msg = _json.loads(data)
+                        except _json.JSONDecodeError:
+                            continue
+                        if msg.get('type') == 'ack':
+                            ack = msg
+                            break
+            if ack is not None:
+                print(f"✅ Received ACK: {ack}")
+            else:
+                print("⚠️ No ACK received (but command sent)")
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error in Test 2: {e}")
+            return False
             
-        ctrl_sock.close()
-        return True
-        
     except Exception as e:
-        print(f"❌ Error in Test 2: {e}")
+        print(f"❌ Error in Test 1: {e}")
         return False
+    finally:
+        sel.close()
+        if sock is not None:
+            sock.close()
 
 def show_connection_instructions():
     """Show instructions for connecting to ESP32 AP"""
@@ -2,10 +2,24 @@
 """
 Simple UDP test to debug ESP32 connectivity issues
 """
+import atexit
 import socket
+import struct
+import sys
 import time
 import json
 
+try:
+    import orjson as _json  # parses bytes directly, much faster than stdlib json
+except ImportError:
+    _json = json
+
+try:
+    from zeroconf import (DNSQuestionType, ServiceBrowser, ServiceInfo,
+                          ServiceStateChange, Zeroconf)
+except ImportError:  # optional; .local names then go through the OS resolver
+    Zeroconf = None
+
 # Try multiple ways to reach the ESP32
 ESP32_ADDRESSES = [
     'fruitbot.local',  # mDNS hostname
@@ -14,17 +28,118 @@ ESP32_ADDRESSES = [
 CTRL_PORT = 9000
 TELEM_PORT = 9001
 
-def resolve_esp32_ip():
-    """Try to resolve ESP32 IP address using different methods"""
+# Service the firmware advertises via MDNS.addService (instance = MDNS_HOSTNAME)
+MDNS_SERVICE = '_esp32-robot._udp.local.'
+MDNS_TIMEOUT_MS = 3000
+# Telemetry receive buffer; large enough to absorb bursts while we print/parse
+RCVBUF_BYTES = 4 << 20
+
+# Linux receive diagnostics; the socket module doesn't name these options.
+# SO_RXQ_OVFL attaches the socket's cumulative drop count to each datagram,
+# SO_TIMESTAMPNS its kernel arrival time (struct timespec).
+SO_RXQ_OVFL = 40
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+ANCBUF_BYTES = 256
+_TIMESPEC = struct.Struct('@ll')
+
+# mDNS lookups can take seconds, so a resolved address is reused for this long
+RESOLVE_TTL_SECONDS = 60.0
+_RESOLVED_ADDR = None  # (family, sockaddr, monotonic time resolved)
+
+# Addresses of advertised ESP32s by instance name, kept current by a
+# background browser so lookups don't wait on the network
+_MDNS_ADDRS = {}
+_MDNS_ZC = None
+
+def _on_service_state_change(zeroconf, service_type, name, state_change):
+    instance = name[:-len(service_type) - 1]
+    if state_change is ServiceStateChange.Removed:
+        _MDNS_ADDRS.pop(instance, None)
+        return
+    info = ServiceInfo(service_type, name)
+    if info.request(zeroconf, MDNS_TIMEOUT_MS, question_type=DNSQuestionType.QM):
+        addresses = info.parsed_addresses()
+        if addresses:
+            _MDNS_ADDRS[instance] = addresses[0]
+
+def start_mdns_browser():
+    """Browse for MDNS_SERVICE in the background, once per process."""
+    global _MDNS_ZC
+    if Zeroconf is None or _MDNS_ZC is not None:
+        return
+    zc = None
+    try:
+        zc = Zeroconf()
+        ServiceBrowser(zc, MDNS_SERVICE, handlers=[_on_service_state_change])
+    except OSError as e:
+        print(f"⚠️ zeroconf browser unavailable: {e}")
+        if zc is not None:
+            zc.close()
+        return
+    _MDNS_ZC = zc
+    atexit.register(zc.close)
+
+# Start browsing now so the cache is warm by the time the test resolves
+start_mdns_browser()
+
+def resolve_mdns(hostname):
+    """Look up a .local ESP32 with a multicast (QM) mDNS query via zeroconf.
+
+    The OS stub resolver may ask unicast-response (QU) questions that the
+    ESP32 responder handles badly, stalling for seconds. Answers come from the
+    background browser's cache when it has seen the ESP32; otherwise a one-off
+    query is sent. Returns an IP string, or None if zeroconf is missing or
+    nothing answered.
+    """
+    if Zeroconf is None:
+        return None
+    instance = hostname[:-len('.local')] if hostname.endswith('.local') else hostname
+    cached = _MDNS_ADDRS.get(instance)
+    if cached is not None:
+        return cached
+    zc = _MDNS_ZC
+    own_zc = zc is None  # browser failed to start; use a temporary instance
+    try:
+        if own_zc:
+            zc = Zeroconf()
+        info = ServiceInfo(MDNS_SERVICE, f"{instance}.{MDNS_SERVICE}")
+        if info.request(zc, MDNS_TIMEOUT_MS, question_type=DNSQuestionType.QM):
+            addresses = info.parsed_addresses()
+            if addresses:
+                return addresses[0]
+    except OSError as e:
+        print(f"⚠️ zeroconf lookup failed: {e}")
+    finally:
+        if own_zc and zc is not None:
+            zc.close()
+    return None
+
+def resolve_esp32_ip(refresh=False):
+    """Resolve the ESP32 to a numeric (family, sockaddr) for sendto.
+
+    The first address that resolves is cached for RESOLVE_TTL_SECONDS, so
+    repeat calls (and every send) skip the name lookup; pass refresh=True
+    to force a new lookup, e.g. after a send fails.
+    """
+    global _RESOLVED_ADDR
+    if (_RESOLVED_ADDR is not None and not refresh
+            and time.monotonic() - _RESOLVED_ADDR[2] < RESOLVE_TTL_SECONDS):
+        return _RESOLVED_ADDR[:2]
+    
     print("=== Resolving ESP32 Address ===")
     
     for addr in ESP32_ADDRESSES:
         print(f"Trying: {addr}")
+        host = addr
+        if addr.endswith('.local'):
+            host = resolve_mdns(addr) or addr  # fall back to the OS resolver
         try:
-            # Test if we can resolve the address
-            socket.getaddrinfo(addr, CTRL_PORT)
-            print(f"✅ Successfully resolved: {addr}")
-            return addr
+            # IPv4 only: the ESP32 and our telemetry socket both speak IPv4
+            family, _, _, _, sockaddr = socket.getaddrinfo(
+                host, CTRL_PORT, socket.AF_INET, socket.SOCK_DGRAM)[0]
+            print(f"✅ Successfully resolved: {addr} -> {sockaddr[0]}")
+            _RESOLVED_ADDR = (family, sockaddr, time.monotonic())
+            return family, sockaddr
         except socket.gaierror as e:
             print(f"❌ Failed to resolve {addr}: {e}")
             continue
@@ -32,59 +147,117 @@ def resolve_esp32_ip():
     print("❌ Could not resolve any ESP32 address")
     return None
 
+def enable_rx_diagnostics(sock):
+    """Turn on drop counting and kernel timestamps; False where unsupported."""
+    if not sys.platform.startswith('linux') or not hasattr(sock, 'recvmsg_into'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError as e:
+        print(f"⚠️ Receive diagnostics unavailable: {e}")
+        return False
+    return True
+
+def parse_rx_ancillary(ancdata):
+    """Return (drop count or None, kernel arrival time in ns or None)."""
+    drops = arrival_ns = None
+    for level, kind, data in ancdata:
+        if level != socket.SOL_SOCKET:
+            continue
+        if kind == SO_RXQ_OVFL and len(data) >= 4:
+            drops = struct.unpack_from('@I', data)[0]
+        elif kind == SO_TIMESTAMPNS and len(data) >= _TIMESPEC.size:
+            sec, nsec = _TIMESPEC.unpack_from(data)
+            arrival_ns = sec * 1_000_000_000 + nsec
+    return drops, arrival_ns
+
 def test_esp32_connectivity():
     print("=== ESP32 Network Test ===")
     
     # First try to resolve the ESP32 address
-    esp32_ip = resolve_esp32_ip()
-    if not esp32_ip:
+    resolved = resolve_esp32_ip()
+    if not resolved:
         print("Cannot proceed without a valid ESP32 address")
         return False
+    _, esp32_addr = resolved
     
-    print(f"Using ESP32 IP: {esp32_ip}")
+    print(f"Using ESP32 IP: {esp32_addr[0]}")
     print(f"Control Port: {CTRL_PORT}")
     print(f"Telemetry Port: {TELEM_PORT}")
     print()
     
+    # One socket for both tests: it receives telemetry and sends the command
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        return _run_tests(sock, esp32_addr)
+    finally:
+        sock.close()
+
+def _run_tests(sock, esp32_addr):
+    """Listen for telemetry, then send a test command, both on sock."""
     # Test 1: Listen for broadcast messages
     print("Test 1: Listening for alive messages...")
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+        # The OS may cap (or, on Linux, double) the request; report what we got
+        print(f"Receive buffer: {sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes")
         sock.bind(('', TELEM_PORT))
         sock.settimeout(10.0)  # 10 second timeout
+        diagnostics = enable_rx_diagnostics(sock)
         
         print(f"Listening on port {TELEM_PORT} for 10 seconds...")
         print("(ESP32 sends alive messages every 10 seconds and encoder data every 50ms)")
         
         messages_received = 0
+        drops = 0
+        prev_transit_ms = None  # arrival time minus ESP32 ts, for jitter
+        # One receive buffer reused for every packet
+        buf = bytearray(1024)
+        mv = memoryview(buf)
         while True:
             try:
-                data, addr = sock.recvfrom(1024)
+                arrival_ns = None
+                if diagnostics:
+                    n, ancdata, _, addr = sock.recvmsg_into([buf], ANCBUF_BYTES)
+                    total_drops, arrival_ns = parse_rx_ancillary(ancdata)
+                    if total_drops is not None and total_drops != drops:
+                        print(f"⚠️ Receive buffer overflowed: {total_drops - drops} packet(s) dropped")
+                        drops = total_drops
+                else:
+                    n, addr = sock.recvfrom_into(buf)
+                data = bytes(mv[:n])
                 messages_received += 1
                 try:
-                    msg = json.loads(data.decode())
+                    msg = _json.loads(data)
                     print(f"✅ Received from {addr}: {msg}")
                     
                     if msg.get('type') == 'alive':
                         print(f"🤖 ESP32 is alive at {msg.get('ip')}!")
-                        sock.close()
                         return True
                     elif msg.get('type') == 'encoders':
                         print(f"📊 ESP32 encoder data received - ESP32 is working!")
+                        # The clocks' offset cancels out between messages, so the
+                        # change in transit time is the one-way jitter
+                        if arrival_ns is not None and 'ts' in msg:
+                            transit_ms = arrival_ns / 1e6 - msg['ts']
+                            if prev_transit_ms is not None:
+                                print(f"⏱️ One-way jitter: {abs(transit_ms - prev_transit_ms):.2f} ms")
+                            prev_transit_ms = transit_ms
                         if messages_received >= 3:  # Got several encoder messages
                             break
-                except json.JSONDecodeError:
+                except _json.JSONDecodeError:
                     print(f"✅ Received non-JSON data from {addr}: {data.decode()}")
                     
             except socket.timeout:
                 print("⏰ Timeout - no messages received")
                 break
-                
-        sock.close()
         
         if messages_received > 0:
             print(f"✅ Received {messages_received} message(s) - ESP32 is communicating!")
+        if drops:
+            print(f"⚠️ {drops} packet(s) dropped at the socket; the receive buffer is too small")
         
     except Exception as e:
         print(f"❌ Error listening: {e}")
@@ -93,7 +266,6 @@ def test_esp32_connectivity():
     # Test 2: Send a command to ESP32
     print("\nTest 2: Sending test command to ESP32...")
     try:
-        ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         test_cmd = {
             'type': 'motor',
             'left': 0,
@@ -102,9 +274,17 @@ def test_esp32_connectivity():
             'ts': int(time.time() * 1000)
         }
         
-        ctrl_sock.sendto(json.dumps(test_cmd).encode(), (esp32_ip, CTRL_PORT))
-        print(f"✅ Sent test command to {esp32_ip}:{CTRL_PORT}")
-        ctrl_sock.close()
+        payload = json.dumps(test_cmd).encode()
+        try:
+            sock.sendto(payload, esp32_addr)
+        except OSError:
+            # The cached address may be stale (e.g. DHCP lease changed); look it up again
+            resolved = resolve_esp32_ip(refresh=True)
+            if not resolved:
+                raise
+            esp32_addr = resolved[1]
+            sock.sendto(payload, esp32_addr)
+        print(f"✅ Sent test command to {esp32_addr[0]}:{CTRL_PORT}")
         
     except Exception as e:
         print(f"❌ Error sending command: {e}")
@@ -12,10 +12,14 @@ def main():
     print("🎯 Turn Precision Test & Calibration")
     print("=" * 40)
     
-    # Initialize controller
+    # Initialize controller; the with block keeps one control socket open for
+    # the whole session and stops the motors on exit, including Ctrl-C
     print("Initializing robot controller...")
-    controller = RobotController()
-    
+    with RobotController() as controller:
+        run_menu(controller)
+
+def run_menu(controller):
+    """Run the turn test menu until the user exits."""
     # Test ESP32 connection
     if not controller.test_esp32_connection():
         print("❌ Cannot connect to ESP32. Check connection and try again.")